@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, Response, abort, jsonify, request, stream_with_context
+from sqlalchemy import and_, select
+
+from models import db, Venue, Artist, Show
+from queries import LOOKUP_LIMIT, decode_cursor, encode_cursor, genre_filter, genre_names, lookup
+from routing import read_only
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+EXPORT_CHUNK = 1000
+MAX_LOOKUP_LIMIT = 50
+
+RESOURCES = {
+    'venues': {
+        'model': Venue,
+        'fields': ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'website', 'image_link',
+                   'facebook_link', 'seeking_talent', 'seeking_description', 'archived_at', 'created_at',
+                   'updated_at'),
+        'filters': {
+            'city': lambda value: Venue.city == value,
+            'state': lambda value: Venue.state == value,
+            'genre': lambda value: genre_filter(Venue, value),
+        },
+        'unarchived': Venue.archived_at.is_(None),
+    },
+    'artists': {
+        'model': Artist,
+        'fields': ('id', 'name', 'city', 'state', 'phone', 'genres', 'website', 'image_link',
+                   'facebook_link', 'seeking_venue', 'seeking_description', 'archived_at', 'created_at',
+                   'updated_at'),
+        'filters': {
+            'city': lambda value: Artist.city == value,
+            'state': lambda value: Artist.state == value,
+            'genre': lambda value: genre_filter(Artist, value),
+        },
+        'unarchived': Artist.archived_at.is_(None),
+    },
+    'shows': {
+        'model': Show,
+        'fields': ('id', 'name', 'date', 'venue_id', 'artist_id', 'created_at', 'updated_at'),
+        'filters': {
+            'venue_id': lambda value: Show.venue_id == int(value),
+            'artist_id': lambda value: Show.artist_id == int(value),
+            'from': lambda value: Show.date >= datetime.fromisoformat(value),
+            'to': lambda value: Show.date < datetime.fromisoformat(value),
+        },
+        # Shows go with their venue or artist when either is archived.
+        'unarchived': and_(Show.venue_id.in_(select(Venue.id).where(Venue.archived_at.is_(None))),
+                           Show.artist_id.in_(select(Artist.id).where(Artist.archived_at.is_(None)))),
+    },
+}
+
+LOOKUP_MODELS = {'venues': Venue, 'artists': Artist}
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({"error": error.description}), error.code
+
+
+def get_session():
+    return db.session
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        abort(404, 'Unknown resource %r.' % name)
+    return resource
+
+
+def selected_fields(resource):
+    fields = request.args.get('fields')
+    if not fields:
+        return resource['fields']
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = set(fields) - set(resource['fields'])
+    if unknown:
+        abort(400, 'Unknown fields: %s.' % ', '.join(sorted(unknown)))
+    return fields if 'id' in fields else ['id'] + fields
+
+
+def build_query(resource, fields):
+    model = resource['model']
+    # Genres are not a column; they are fetched separately for each batch of ids.
+    columns = [getattr(model, field) for field in fields if field != 'genres']
+    stmt = select(*columns)
+    # Archived rows are hidden as on the site, unless asked for with ?archived=1.
+    if request.args.get('archived') != '1':
+        stmt = stmt.where(resource['unarchived'])
+    for name, make_filter in resource['filters'].items():
+        value = request.args.get(name)
+        if value:
+            try:
+                stmt = stmt.where(make_filter(value))
+            except ValueError:
+                abort(400, 'Invalid value for %s: %r.' % (name, value))
+    return stmt.order_by(model.id)
+
+
+def serialize(resource, fields, rows):
+    """Turns a batch of rows into dicts, adding genres with one query per batch."""
+    items = [dict(row._mapping) for row in rows]
+    if 'genres' in fields and items:
+        genres = genre_names(get_session(), resource['model'], [item['id'] for item in items])
+        for item in items:
+            item['genres'] = genres.get(item['id'], [])
+    return [{field: item[field] for field in fields} for item in items]
+
+
+# ----------------------------------------------------------------------------#
+# Collections
+# ----------------------------------------------------------------------------#
+
+@api.route('/<resource_name>')
+@read_only
+def list_resource(resource_name):
+    resource = get_resource(resource_name)
+    fields = selected_fields(resource)
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    stmt = build_query(resource, fields)
+    cursor = request.args.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor, int)
+        if after is None:
+            abort(400, 'Invalid cursor.')
+        stmt = stmt.where(resource['model'].id > after[0])
+    rows = get_session().execute(stmt.limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    body = {
+        "data": serialize(resource, fields, rows[:limit]),
+        "next_cursor": next_cursor,
+    }
+    return Response(json.dumps(body, default=json_default), mimetype='application/json')
+
+
+@api.route('/<resource_name>/<int:item_id>')
+@read_only
+def get_item(resource_name, item_id):
+    resource = get_resource(resource_name)
+    fields = selected_fields(resource)
+    rows = get_session().execute(build_query(resource, fields).where(resource['model'].id == item_id)).all()
+    if not rows:
+        abort(404, 'No %s with id %s.' % (resource_name[:-1], item_id))
+    return Response(json.dumps(serialize(resource, fields, rows)[0], default=json_default),
+                    mimetype='application/json')
+
+
+@api.route('/<resource_name>/lookup')
+@read_only
+def lookup_resource(resource_name):
+    """Top matches by name prefix, for the typeahead fields of the show form."""
+    model = LOOKUP_MODELS.get(resource_name)
+    if model is None:
+        abort(404, 'No lookup for %r.' % resource_name)
+    limit = min(max(request.args.get('limit', LOOKUP_LIMIT, type=int), 1), MAX_LOOKUP_LIMIT)
+    return jsonify({"data": lookup(get_session(), model, request.args.get('q', '').strip(), limit)})
+
+
+# ----------------------------------------------------------------------------#
+# Export
+# ----------------------------------------------------------------------------#
+
+@api.route('/export/<resource_name>.<export_format>')
+@read_only
+def export(resource_name, export_format):
+    """Streams a whole (filtered) collection as NDJSON or CSV in constant memory."""
+    resource = get_resource(resource_name)
+    if export_format not in ('ndjson', 'csv'):
+        abort(404, 'Unknown export format %r.' % export_format)
+    fields = selected_fields(resource)
+    stmt = build_query(resource, fields)
+
+    def generate():
+        result = get_session().execute(stmt, execution_options={'yield_per': EXPORT_CHUNK})
+        try:
+            if export_format == 'csv':
+                yield ','.join(fields) + '\r\n'
+            for rows in result.partitions():
+                items = serialize(resource, fields, rows)
+                if export_format == 'ndjson':
+                    yield ''.join(json.dumps(item, default=json_default) + '\n' for item in items)
+                else:
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for item in items:
+                        writer.writerow([csv_value(item[field]) for field in fields])
+                    yield buffer.getvalue()
+        finally:
+            result.close()
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (resource_name, export_format)
+    return response
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import Blueprint, Response, abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # .br copies are skipped without it
+    brotli = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.eot', '.otf', '.json', '.map')
+
+# Logical bundle name -> source files, relative to the static folder, in order.
+BUNDLES = {
+    'main.css': ('css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                 'css/main.quickfix.css'),
+    'head.js': ('js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js', 'js/script.js'),
+    'footer.js': ('js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'),
+}
+
+assets = Blueprint('assets', __name__)
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s*([{};:,>])\s*')
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^)\'"]+)\1\s*\)')
+_ABSOLUTE_URL = re.compile(r'^(?:[a-z]+:|/|#)')
+
+
+# ----------------------------------------------------------------------------#
+# Minifying
+# ----------------------------------------------------------------------------#
+
+def minify_css(text):
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(r'\1', ' '.join(text.split()))
+    return text.replace(';}', '}')
+
+
+def minify_js(text):
+    # Deliberately conservative: without a parser only whole-line comments and
+    # indentation are safe to drop. Vendored .min.js files are left as they are.
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def minify(name, text):
+    if name.endswith('.min.js') or name.endswith('.min.css'):
+        return text
+    return minify_css(text) if name.endswith('.css') else minify_js(text)
+
+
+# ----------------------------------------------------------------------------#
+# Building
+# ----------------------------------------------------------------------------#
+
+def fingerprint(name, content):
+    stem, ext = posixpath.splitext(name)
+    return '%s.%s%s' % (stem, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def rewrite_urls(source, text, resolve):
+    """Rewrites the relative url()s of a stylesheet, passing the static-relative
+    path of each target through ``resolve``."""
+    def replace(match):
+        url = match.group(2)
+        if _ABSOLUTE_URL.match(url):
+            return match.group(0)
+        path = re.split(r'[?#]', url, 1)[0]
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        return 'url("%s%s")' % (resolve(target), url[len(path):])
+    return _CSS_URL.sub(replace, text)
+
+
+def write(static, name, content):
+    path = os.path.join(static, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as out:
+        out.write(content)
+    if name.endswith(COMPRESSIBLE):
+        # mtime=0 keeps the gzip output identical between builds.
+        compressed = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            compressed.append(('.br', brotli.compress(content)))
+        for suffix, data in compressed:
+            if len(data) < len(content):
+                with open(path + suffix, 'wb') as out:
+                    out.write(data)
+
+
+def build(static):
+    """Writes fingerprinted, precompressed copies of every static file and bundle
+    into static/dist and returns the manifest of logical names."""
+    dist = os.path.join(static, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    # Plain files first, so the bundles can point at their hashed names.
+    for root, dirs, files in os.walk(static):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for filename in sorted(files):
+            name = os.path.relpath(os.path.join(root, filename), static).replace(os.sep, '/')
+            if name.endswith('.map'):
+                continue
+            with open(os.path.join(root, filename), 'rb') as source:
+                content = source.read()
+            manifest[name] = posixpath.join(DIST, fingerprint(name, content))
+            write(static, manifest[name], content)
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static, source), encoding='utf-8') as text:
+                part = minify(source, text.read())
+            if source.endswith('.css'):
+                # Bundles sit in dist, next to the fingerprinted copies.
+                part = rewrite_urls(source, part,
+                                    lambda target: posixpath.relpath(manifest.get(target, target), DIST))
+            parts.append(part)
+        # A newline plus ';' keeps a script missing its final semicolon separate.
+        content = ('\n' if bundle.endswith('.css') else '\n;').join(parts).encode('utf-8')
+        manifest[bundle] = posixpath.join(DIST, fingerprint(bundle, content))
+        write(static, manifest[bundle], content)
+    with open(os.path.join(dist, MANIFEST), 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static):
+    try:
+        with open(os.path.join(static, DIST, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+# ----------------------------------------------------------------------------#
+# Serving
+# ----------------------------------------------------------------------------#
+
+def asset_url(name):
+    """URL of a logical asset ('main.css', 'js/libs/jquery-1.11.1.min.js').
+
+    Falls back to the unbuilt files when `flask build-assets` has not run.
+    """
+    manifest = current_app.extensions.get('assets')
+    if manifest and name in manifest:
+        return url_for('static', filename=manifest[name])
+    if name in BUNDLES:
+        return url_for('assets.bundle', name=name)
+    return url_for('static', filename=name)
+
+
+@assets.route('/static/dist/<path:filename>')
+def dist(filename):
+    directory = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] > 0 and os.path.isfile(os.path.join(directory, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+    response = send_from_directory(directory, filename, mimetype=mimetype,
+                                   max_age=current_app.config['ASSETS_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # Every name carries its content hash, so it can be cached for good.
+    response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % current_app.config['ASSETS_MAX_AGE']
+    return response
+
+
+@assets.route('/static/bundle/<name>')
+def bundle(name):
+    # Development only: concatenates a bundle on the fly when nothing was built.
+    sources = BUNDLES.get(name)
+    if sources is None:
+        abort(404)
+    parts = []
+    for source in sources:
+        with open(os.path.join(current_app.static_folder, source), encoding='utf-8') as text:
+            part = text.read()
+        if source.endswith('.css'):
+            part = rewrite_urls(source, part, lambda target: url_for('static', filename=target))
+        parts.append(part)
+    return Response(('\n' if name.endswith('.css') else '\n;').join(parts), mimetype=mimetypes.guess_type(name)[0])
+
+
+def register(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.register_blueprint(assets)
+
+    @app.cli.command('build-assets')
+    def build_command():
+        """Bundles, minifies, fingerprints and precompresses static files."""
+        manifest = build(app.static_folder)
+        click.echo('Wrote %d assets to %s (brotli %s).' % (
+            len(manifest), os.path.join(app.static_folder, DIST), 'on' if brotli else 'not installed'))
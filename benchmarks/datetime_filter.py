@@ -0,0 +1,59 @@
+"""Compares the `datetime` Jinja filter with the string-parsing path it replaced.
+
+    python -m benchmarks.datetime_filter [--tiles 5000] [--distinct 200]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from filters import DATETIME_FORMATS, _format, format_datetime
+
+
+def legacy_format_datetime(value, f='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[f], locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tiles', type=int, default=5000, help='filter calls per rendered page')
+    parser.add_argument('--distinct', type=int, default=200, help='distinct show times on the page')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    start = datetime(2030, 1, 1, 20, 0)
+    times = [start + timedelta(hours=6 * i) for i in range(args.distinct)]
+    values = [random.choice(times) for _ in range(args.tiles)]
+    strings = [str(value) for value in values]
+    assert all(legacy_format_datetime(s, 'full') == format_datetime(v, 'full') for s, v in zip(strings, values))
+
+    def legacy():
+        for value in strings:
+            legacy_format_datetime(value, 'full')
+
+    def cold():
+        _format.cache_clear()
+        for value in values:
+            format_datetime(value, 'full')
+
+    def warm():
+        for value in values:
+            format_datetime(value, 'full')
+
+    print('%d calls, %d distinct timestamps' % (args.tiles, args.distinct))
+    baseline = None
+    for name, run in (('legacy (str + dateutil + babel)', legacy), ('memoized, cold cache', cold),
+                      ('memoized, warm cache', warm)):
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        per_call = best / args.tiles * 1e6
+        baseline = baseline or per_call
+        print('%-34s %8.2f us/call  %6.1fx' % (name, per_call, baseline / per_call))
+
+
+if __name__ == '__main__':
+    main()
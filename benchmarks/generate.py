@@ -0,0 +1,136 @@
+"""Fills a database with a deterministic synthetic data set for benchmarking.
+
+    DATABASE_URL=sqlite:////tmp/fyyur-bench.db python -m benchmarks.generate --create \\
+        --venues 100000 --artists 50000 --shows 5000000
+
+The same --seed always produces the same rows. Loading goes through the bulk
+import helpers, so it uses COPY on Postgres.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import flask_migrate
+
+from app import create_app
+from counters import recount
+from forms import genres_choices, state_choices
+from importer import allocate_ids, copy_rows
+from models import db, Venue, Artist, Show, GENRE_LINKS, genre_ids
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Vocabulary for names; the load driver searches with the same words.
+WORDS = ('blue', 'red', 'golden', 'silver', 'velvet', 'electric', 'lunar', 'urban', 'wild', 'quiet', 'neon',
+         'royal', 'hidden', 'broken', 'lucky', 'crimson', 'atomic', 'midnight', 'northern', 'paper')
+VENUE_NOUNS = ('hall', 'club', 'lounge', 'theatre', 'room', 'garden', 'arena', 'cellar', 'stage', 'bar')
+ARTIST_NOUNS = ('band', 'quartet', 'collective', 'orchestra', 'trio', 'brothers', 'sisters', 'project')
+CITIES = ('San Francisco', 'New York', 'Chicago', 'Austin', 'Seattle', 'Denver', 'Boston', 'Portland',
+          'Atlanta', 'Miami', 'Nashville', 'Detroit', 'Phoenix', 'Dallas', 'Houston', 'Oakland')
+GENRES = [name for name, _ in genres_choices]
+STATES = [name for name, _ in state_choices]
+
+
+def place(rng):
+    return {'city': rng.choice(CITIES), 'state': rng.choice(STATES), 'phone': '%03d-%03d-%04d' % (
+        rng.randrange(1000), rng.randrange(1000), rng.randrange(10000))}
+
+
+def venue_row(rng, number):
+    name = '%s %s %s' % (rng.choice(WORDS), rng.choice(WORDS), rng.choice(VENUE_NOUNS))
+    return dict(place(rng),
+                name='The %s %d' % (name.title(), number),
+                address='%d %s Street' % (rng.randrange(1, 9999), rng.choice(WORDS).title()),
+                image_link='https://picsum.photos/seed/venue%d/300/300' % number,
+                facebook_link='https://www.facebook.com/venue%d' % number,
+                website='https://venue%d.example.com' % number,
+                seeking_talent=rng.random() < 0.3,
+                seeking_description=None)
+
+
+def artist_row(rng, number):
+    name = '%s %s' % (rng.choice(WORDS), rng.choice(ARTIST_NOUNS))
+    return dict(place(rng),
+                name='%s %d' % (name.title(), number),
+                image_link='https://picsum.photos/seed/artist%d/300/300' % number,
+                facebook_link='https://www.facebook.com/artist%d' % number,
+                website=None,
+                seeking_venue=rng.random() < 0.3,
+                seeking_description=None)
+
+
+def stamped(row, now):
+    return dict(row, created_at=now, updated_at=now, version=1)
+
+
+def load_owners(session, rng, model, make_row, total, batch_size, report):
+    link, owner_id = GENRE_LINKS[model]
+    genres = genre_ids(session, GENRES)
+    now = datetime.utcnow()
+    for start in range(0, total, batch_size):
+        rows = [stamped(make_row(rng, number), now) for number in range(start, min(start + batch_size, total))]
+        allocate_ids(session, model, rows)
+        copy_rows(session, model.__table__, rows)
+        copy_rows(session, link, [{'genre_id': genres[name], owner_id.name: row['id']}
+                                  for row in rows for name in rng.sample(GENRES, rng.randint(1, 3))])
+        session.commit()
+        report(model.__tablename__, start + len(rows))
+
+
+def load_shows(session, rng, total, batch_size, report, spread_days=730):
+    venue_ids = session.execute(db.select(db.func.min(Venue.id), db.func.max(Venue.id))).one()
+    artist_ids = session.execute(db.select(db.func.min(Artist.id), db.func.max(Artist.id))).one()
+    if None in venue_ids or None in artist_ids:
+        raise SystemExit('Shows need venues and artists to point at.')
+    now = datetime.utcnow()
+    for start in range(0, total, batch_size):
+        rows = []
+        for number in range(start, min(start + batch_size, total)):
+            # Whole half hours, half of them in the past.
+            date = now.replace(minute=0, second=0, microsecond=0) + \
+                timedelta(minutes=30 * rng.randint(-spread_days * 48, spread_days * 48))
+            rows.append(stamped({'name': 'Show %d' % number,
+                                 'date': date,
+                                 'is_past': date < now,
+                                 'venue_id': rng.randint(*venue_ids),
+                                 'artist_id': rng.randint(*artist_ids)}, now))
+        copy_rows(session, Show.__table__, rows)
+        session.commit()
+        report(Show.__tablename__, start + len(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--create', action='store_true', help='run the migrations first')
+    parser.add_argument('--config', default=None, help='config name, defaults to FYYUR_CONFIG')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    rng = random.Random(args.seed)
+    started = time.monotonic()
+
+    def report(table, done):
+        elapsed = time.monotonic() - started
+        print('%-7s %10d rows  %8.1fs' % (table, done, elapsed), flush=True)
+
+    with app.app_context():
+        if args.create:
+            flask_migrate.upgrade(directory=MIGRATIONS)
+        session = db.session
+        load_owners(session, rng, Venue, venue_row, args.venues, args.batch_size, report)
+        load_owners(session, rng, Artist, artist_row, args.artists, args.batch_size, report)
+        if args.shows:
+            load_shows(session, rng, args.shows, args.batch_size, report)
+        recount(session)
+    print('Done in %.1fs.' % (time.monotonic() - started))
+
+
+if __name__ == '__main__':
+    main()
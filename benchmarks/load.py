@@ -0,0 +1,178 @@
+"""Drives every page and API route in-process and reports latency per route.
+
+    python -m benchmarks.load --requests 200 --concurrency 4 --save benchmarks/baselines/sqlite.json
+    python -m benchmarks.load --compare benchmarks/baselines/sqlite.json
+
+Point DATABASE_URL at a database filled by benchmarks.generate. Query counts
+come from the Server-Timing header, which the driver turns on. The rate
+limiter is turned off, and the page cache is disabled unless --cache is given.
+With --compare the exit status is 1 when any route's p95 or queries per
+request regressed past the tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from app import create_app
+from benchmarks.generate import WORDS, GENRES, STATES
+from models import db, Venue, Artist
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def routes(rng, venue_ids, artist_ids):
+    """(name, make_url) for every read route; write routes are left out so the
+    data set stays the same between runs."""
+    def venue():
+        return rng.randint(*venue_ids)
+
+    def artist():
+        return rng.randint(*artist_ids)
+
+    return [
+        ('/', lambda: '/'),
+        ('/venues', lambda: '/venues'),
+        ('/venues?page=', lambda: '/venues?page=%d' % rng.randint(2, 20)),
+        ('/venues?state=', lambda: '/venues?state=%s' % rng.choice(STATES)),
+        ('/venues?genre=', lambda: '/venues?genre=%s' % rng.choice(GENRES)),
+        ('/venues/search', lambda: '/venues/search?search_term=%s' % rng.choice(WORDS)),
+        ('/venues/<id>', lambda: '/venues/%d' % venue()),
+        ('/venues/<id>/edit', lambda: '/venues/%d/edit' % venue()),
+        ('/venues/create', lambda: '/venues/create'),
+        ('/artists', lambda: '/artists'),
+        ('/artists?genre=', lambda: '/artists?genre=%s' % rng.choice(GENRES)),
+        ('/artists?start=', lambda: '/artists?start=%s' % rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')),
+        ('/artists/search', lambda: '/artists/search?search_term=%s+%s' % (rng.choice(WORDS), rng.choice('bqt'))),
+        ('/artists/<id>', lambda: '/artists/%d' % artist()),
+        ('/artists/<id>/edit', lambda: '/artists/%d/edit' % artist()),
+        ('/artists/create', lambda: '/artists/create'),
+        ('/shows', lambda: '/shows'),
+        ('/shows?mode=upcoming', lambda: '/shows?mode=upcoming'),
+        ('/shows?mode=past', lambda: '/shows?mode=past'),
+        ('/shows/create', lambda: '/shows/create'),
+        ('/api/v1/venues', lambda: '/api/v1/venues?limit=100'),
+        ('/api/v1/venues/<id>', lambda: '/api/v1/venues/%d' % venue()),
+        ('/api/v1/artists', lambda: '/api/v1/artists?limit=100'),
+        ('/api/v1/shows', lambda: '/api/v1/shows?limit=100'),
+        ('/api/v1/venues/lookup', lambda: '/api/v1/venues/lookup?q=the+%s' % rng.choice(WORDS)[:2]),
+        ('/api/v1/artists/lookup', lambda: '/api/v1/artists/lookup?q=%s' % rng.choice(WORDS)[:3]),
+    ]
+
+
+def percentile(values, fraction):
+    # Nearest-rank on the sorted latencies.
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def run_route(app, make_url, requests, concurrency):
+    urls = [make_url() for _ in range(requests)]
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = app.test_client()
+        for url in chunk:
+            started = time.perf_counter()
+            response = client.get(url)
+            response.close()
+            elapsed = time.perf_counter() - started
+            match = _QUERIES.search(response.headers.get('Server-Timing', ''))
+            with lock:
+                latencies.append(elapsed)
+                queries.append(int(match.group(1)) if match else 0)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(urls[index::concurrency],)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "throughput": len(latencies) / wall,
+        "queries": sum(queries) / len(queries),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Returns a line per regressed route."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95"] > previous["p95"] * (1 + tolerance) and current["p95"] - previous["p95"] > min_delta_ms:
+            regressions.append('%s: p95 %.1f ms -> %.1f ms' % (name, previous["p95"], current["p95"]))
+        if current["queries"] > previous["queries"] + 0.5:
+            regressions.append('%s: %.1f -> %.1f queries per request' % (name, previous["queries"],
+                                                                         current["queries"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--route', action='append', help='only run routes containing this text')
+    parser.add_argument('--cache', action='store_true', help='keep the page cache on')
+    parser.add_argument('--config', default=None, help='config name, defaults to FYYUR_CONFIG')
+    parser.add_argument('--save', help='write the results as a baseline')
+    parser.add_argument('--compare', help='baseline to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p95 slowdown, as a fraction')
+    parser.add_argument('--min-delta', type=float, default=5.0, help='ignore p95 changes below this many ms')
+    args = parser.parse_args()
+
+    app = create_app(args.config, PROFILE_REQUESTS=True, PROFILE_PANEL=False, RATELIMIT_ENABLED=False)
+    if not args.cache:
+        app.extensions['cache'].default_ttl = 0
+    rng = random.Random(args.seed)
+    with app.app_context():
+        venue_ids = db.session.execute(db.select(db.func.min(Venue.id), db.func.max(Venue.id))).one()
+        artist_ids = db.session.execute(db.select(db.func.min(Artist.id), db.func.max(Artist.id))).one()
+    if None in venue_ids or None in artist_ids:
+        sys.exit('The database is empty; fill it with python -m benchmarks.generate first.')
+
+    results = {}
+    print('%-24s %6s %6s %9s %9s %9s %9s %8s' % ('route', 'reqs', 'errors', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                 'req/s', 'queries'))
+    for name, make_url in routes(rng, venue_ids, artist_ids):
+        if args.route and not any(part in name for part in args.route):
+            continue
+        stats = results[name] = run_route(app, make_url, args.requests, args.concurrency)
+        print('%-24s %6d %6d %9.1f %9.1f %9.1f %9.1f %8.1f' % (
+            name, stats["requests"], stats["errors"], stats["p50"], stats["p95"], stats["p99"],
+            stats["throughput"], stats["queries"]), flush=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as baseline:
+            json.dump({"created": datetime.utcnow().isoformat(), "requests": args.requests,
+                       "concurrency": args.concurrency, "routes": results}, baseline, indent=2, sort_keys=True)
+        print('Saved baseline to %s.' % args.save)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)["routes"], args.tolerance, args.min_delta)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against %s.' % args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from sqlalchemy import delete, update
+
+import counters
+from queries import counterpart_ids
+
+# Upper bound on ids per request; keeps the IN lists under every database's
+# bound parameter limit.
+MAX_BULK_IDS = 1000
+
+
+def delete_owners(session, model, ids):
+    """Deletes venues (or artists) with a single DELETE, leaving their shows and
+    genre links to the ON DELETE CASCADE foreign keys, so none are loaded.
+
+    Returns the number of rows deleted and the ids of the artists (or venues)
+    that had shows with them.
+    """
+    affected = counterpart_ids(session, model, *ids)
+    counters.uncount_owners(session, model, ids)
+    table = model.__table__
+    result = session.execute(delete(table).where(table.c.id.in_(ids)))
+    return result.rowcount, affected
+
+
+def archive_owners(session, model, ids, archived=True):
+    """Archives (or restores) venues or artists with a single UPDATE.
+
+    Returns the number of rows that changed state.
+    """
+    now = datetime.utcnow()
+    table = model.__table__
+    state = table.c.archived_at.is_(None) if archived else table.c.archived_at.isnot(None)
+    # Versioned rows updated outside the ORM bump their version by hand.
+    result = session.execute(update(table)
+                             .where(table.c.id.in_(ids), state)
+                             .values(archived_at=now if archived else None,
+                                     updated_at=now,
+                                     version=table.c.version + 1))
+    return result.rowcount
@@ -0,0 +1,232 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+
+# Marks keys deleted within the replica lag window (see Cache.delete).
+INVALIDATED_PREFIX = 'invalidated:'
+
+
+# ----------------------------------------------------------------------------#
+# Backends
+# ----------------------------------------------------------------------------#
+
+class MemoryBackend:
+    """Per-process LRU dictionary with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteBackend:
+    """LRU cache in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache ('
+                               'key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)')
+
+    def _connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=5)
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute('SELECT value FROM cache WHERE key = ? AND expires >= ?',
+                                     (key, now)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                               (key, pickle.dumps(value), now + ttl, now))
+            connection.execute('DELETE FROM cache WHERE expires < ?', (now,))
+            connection.execute('DELETE FROM cache WHERE key IN ('
+                               'SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                               (self.max_entries,))
+
+    def delete(self, *keys):
+        with self._connect() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM cache')
+
+
+# ----------------------------------------------------------------------------#
+# Cache
+# ----------------------------------------------------------------------------#
+
+class Cache:
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        self.default_ttl = 300
+        self.hits = 0
+        self.misses = 0
+        self.stats_lock = threading.Lock()
+        # Seconds a deleted key stays marked as recently invalidated; only
+        # needed when replicas can lag behind the primary.
+        self.invalidation_window = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', 1024)
+        backend = app.config.get('CACHE_TYPE', 'memory')
+        if backend == 'sqlite':
+            path = app.config.get('CACHE_PATH') or os.path.join(app.instance_path, 'cache.sqlite')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path, max_entries)
+        elif backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        else:
+            raise ValueError('Unknown CACHE_TYPE %r' % backend)
+        if app.config.get('SQLALCHEMY_REPLICA_URIS'):
+            self.invalidation_window = app.config.get('REPLICA_STICKY_SECONDS', 5)
+        app.extensions['cache'] = self
+
+    def _count(self, hit):
+        with self.stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self._count(value is not None)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.backend.delete(*keys)
+            if self.invalidation_window:
+                for key in keys:
+                    self.backend.set(INVALIDATED_PREFIX + key, True, self.invalidation_window)
+
+    def recently_invalidated(self, key):
+        return bool(self.invalidation_window) and self.backend.get(INVALIDATED_PREFIX + key) is not None
+
+    def _may_store(self, key):
+        # A replica may not have the write behind a fresh invalidation yet; what
+        # it returns is served to this request but not cached for everyone.
+        return not (has_request_context() and g.get('db_replica') and self.recently_invalidated(key))
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_set(self, key, produce, ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = produce()
+            if self._may_store(key):
+                self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        with self.stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def cached_page(self, key):
+        """Caches the rendered HTML of a view under ``key(**view_args)``.
+
+        Requests with a query string, or with flashed messages waiting to be
+        shown, bypass the cache so neither ends up stored for everyone else.
+        Under @conditional, pages are stored with the ETag they were rendered
+        for: once the validator moves on (a show started, counters rolled
+        over), the stored page is a miss rather than old HTML under a new tag.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.args or session.get('_flashes'):
+                    return view(**kwargs)
+                cache_key = key(**kwargs)
+                etag = g.get('etag')
+                entry = self.backend.get(cache_key)
+                if entry is not None and entry[0] == etag:
+                    self._count(True)
+                    return entry[1]
+                self._count(False)
+                page = view(**kwargs)
+                if isinstance(page, str) and self._may_store(cache_key):
+                    self.set(cache_key, (etag, page))
+                return page
+
+            # Lets routing.py send a recently invalidated page to the primary.
+            wrapper.cache_key = key
+            return wrapper
+
+        return decorator
+
+
+def venue_page_key(venue_id):
+    return 'page:venue:%s' % venue_id
+
+
+def artist_page_key(artist_id):
+    return 'page:artist:%s' % artist_id
+
+
+def artist_index_key(genre=None):
+    # The A-Z index of /artists, one per genre filter.
+    return 'artists:index:%s' % (genre or '')
@@ -0,0 +1,95 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only without it
+    brotli = None
+
+
+class GzipStream:
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS writes a gzip header instead of a zlib one.
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        # Flushed per chunk, so the client can start on what has been sent.
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def choose_encoding(accept_encodings):
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Ends stream_with_context(), which holds the request context open.
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def register(app):
+    """Compresses HTML and JSON responses for clients that accept it. Call it
+    before the other after_request hooks are added, so it runs after them."""
+
+    @app.after_request
+    def compress(response):
+        config = app.config
+        if not config['COMPRESS_ENABLED'] or response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 206, 304) \
+                or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            # The size is unknown up front, so streams are always compressed.
+            compressor = BrotliStream(config['COMPRESS_BROTLI_QUALITY']) if encoding == 'br' \
+                else GzipStream(config['COMPRESS_LEVEL'])
+            response.response = compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY']))
+            else:
+                response.set_data(gzip.compress(data, config['COMPRESS_LEVEL'], mtime=0))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity ones, so the ETag only
+        # still holds as a weak validator.
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
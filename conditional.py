@@ -0,0 +1,53 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import g, make_response, request, session
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Weak comparison, as If-None-Match calls for: compressed responses
+        # carry the same tag marked weak.
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(validator):
+    """Answers conditional GETs before the view does any work.
+
+    ``validator(**view_args)`` returns ``(parts, last_modified)`` from cheap
+    queries, or None to let the view handle the request (e.g. to 404). The
+    ETag is left in ``g.etag`` for Cache.cached_page to store pages under.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Pages carrying flashed messages are one-offs; never validate them.
+            version = None if session.get('_flashes') else validator(**kwargs)
+            if version is None:
+                return view(**kwargs)
+            parts, last_modified = version
+            etag = g.etag = make_etag(request.full_path, *parts)
+            if last_modified is not None:
+                # HTTP dates have second resolution and are always UTC.
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+            if not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(**kwargs))
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
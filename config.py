@@ -1,10 +1,135 @@
 import os
-SECRET_KEY = os.urandom(32)
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
 
-# Connect to the database
-SQLALCHEMY_DATABASE_URI = '<DBDIALECT>://<DBNAME>:<PASS>@<HOST_IP>:<HOST_PORT>/<SCHEMA>'
+def _env(name, default, cast=str):
+    value = os.environ.get(name)
+    return default if value is None else cast(value)
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    SECRET_KEY = _env('SECRET_KEY', None) or os.urandom(32)
+    DEBUG = False
+
+    # Connect to the database
+    SQLALCHEMY_DATABASE_URI = _env('DATABASE_URL', '<DBDIALECT>://<DBNAME>:<PASS>@<HOST_IP>:<HOST_PORT>/<SCHEMA>')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Extra engine options, merged over the ones built from the DB_* settings.
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # Comma-separated replica URLs; read-only views pick one at random. Two
+    # SQLite files can stand in for primary and replica locally.
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in _env('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    # How long someone's reads stay on the primary after they wrote something.
+    REPLICA_STICKY_SECONDS = _env('REPLICA_STICKY_SECONDS', 5, int)
+
+    # Connection pool, per worker process: size it from /pool/stats under load
+    # so that peak_checked_out stays below DB_POOL_SIZE + DB_MAX_OVERFLOW.
+    # Sizing and the statement timeout are ignored on SQLite.
+    DB_POOL_SIZE = _env('DB_POOL_SIZE', 5, int)
+    DB_MAX_OVERFLOW = _env('DB_MAX_OVERFLOW', 10, int)
+    DB_POOL_TIMEOUT = _env('DB_POOL_TIMEOUT', 30, int)
+    DB_POOL_RECYCLE = _env('DB_POOL_RECYCLE', 1800, int)
+    DB_POOL_PRE_PING = _env('DB_POOL_PRE_PING', True, _flag)
+    # Milliseconds; 0 disables it.
+    DB_STATEMENT_TIMEOUT = _env('DB_STATEMENT_TIMEOUT', 0, int)
+
+    # Per-request query/render timings in a Server-Timing header; the panel is
+    # appended to HTML pages. Statement shapes repeated this often in one
+    # request are logged as likely N+1 queries. Off outside development, as
+    # the header tells every client how the database is queried.
+    PROFILE_REQUESTS = _env('PROFILE_REQUESTS', False, _flag)
+    PROFILE_PANEL = False
+    PROFILE_N_PLUS_ONE_THRESHOLD = _env('PROFILE_N_PLUS_ONE_THRESHOLD', 5, int)
+
+    # Log records are queued by the request threads and written as JSON lines
+    # to LOG_FILE (stderr when empty) by a background thread. Records that do
+    # not fit in the queue are dropped and counted in /logs/stats rather than
+    # holding up a request. LOG_REQUESTS adds one record per request.
+    LOG_FILE = _env('LOG_FILE', 'error.log')
+    LOG_LEVEL = _env('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = _env('LOG_QUEUE_SIZE', 10000, int)
+    LOG_REQUESTS = _env('LOG_REQUESTS', False, _flag)
+
+    # Searches are admitted per client and route by a token bucket refilled at
+    # RATELIMIT_SEARCH_RATE per second up to RATELIMIT_SEARCH_BURST (429 past
+    # that), then at most SEARCH_MAX_CONCURRENT run at once per process; a
+    # search that waits SEARCH_QUEUE_TIMEOUT seconds for a slot gets a 503.
+    # 'memory' buckets are per process, 'sqlite' ones are shared by every
+    # worker on the host through RATELIMIT_PATH (defaults to the instance folder).
+    RATELIMIT_ENABLED = _env('RATELIMIT_ENABLED', True, _flag)
+    RATELIMIT_STORAGE = _env('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_PATH = _env('RATELIMIT_PATH', None)
+    RATELIMIT_SEARCH_RATE = _env('RATELIMIT_SEARCH_RATE', 1.0, float)
+    RATELIMIT_SEARCH_BURST = _env('RATELIMIT_SEARCH_BURST', 10, int)
+    SEARCH_MAX_CONCURRENT = _env('SEARCH_MAX_CONCURRENT', 4, int)
+    SEARCH_QUEUE_TIMEOUT = _env('SEARCH_QUEUE_TIMEOUT', 0.5, float)
+
+    # The list pages are streamed in chunks of about STREAM_CHUNK_SIZE characters.
+    # HTML and JSON responses of at least COMPRESS_MIN_SIZE bytes (and every
+    # stream) are sent with brotli, when installed, or gzip to clients that
+    # accept either.
+    STREAM_CHUNK_SIZE = _env('STREAM_CHUNK_SIZE', 8192, int)
+    COMPRESS_ENABLED = _env('COMPRESS_ENABLED', True, _flag)
+    COMPRESS_MIN_SIZE = _env('COMPRESS_MIN_SIZE', 1024, int)
+    COMPRESS_LEVEL = _env('COMPRESS_LEVEL', 6, int)
+    COMPRESS_BROTLI_QUALITY = _env('COMPRESS_BROTLI_QUALITY', 5, int)
+    COMPRESS_MIMETYPES = ('text/html', 'application/json', 'application/x-ndjson', 'text/csv')
+
+    # Prometheus metrics at /metrics. Each process counts on its own; with
+    # METRICS_DIR set, workers write their counts there every
+    # METRICS_FLUSH_SECONDS and a scrape of any worker adds them all up.
+    METRICS_ENABLED = _env('METRICS_ENABLED', True, _flag)
+    METRICS_DIR = _env('METRICS_DIR', None)
+    METRICS_FLUSH_SECONDS = _env('METRICS_FLUSH_SECONDS', 5, int)
+
+    # Client addresses allowed to read /metrics and the /*/stats endpoints,
+    # comma-separated; empty leaves them open. They reveal cache keys and hit
+    # rates, pool sizes and dropped logs, so production allows loopback only.
+    OPS_ALLOWED_ADDRS = [addr for addr in _env('OPS_ALLOWED_ADDRS', '').split(',') if addr]
+
+    # Fingerprinted assets from `flask build-assets` never change under a name.
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Page and data cache: 'memory' is per process, 'sqlite' is shared by every
+    # worker on the host through CACHE_PATH (defaults to the instance folder).
+    # CLI commands such as `flask rollover-shows` can only invalidate 'sqlite'.
+    CACHE_TYPE = _env('CACHE_TYPE', 'memory')
+    CACHE_PATH = _env('CACHE_PATH', None)
+    CACHE_DEFAULT_TTL = _env('CACHE_DEFAULT_TTL', 300, int)
+    CACHE_MAX_ENTRIES = _env('CACHE_MAX_ENTRIES', 1024, int)
+
+
+class DevelopmentConfig(Config):
+    # Enable debug mode.
+    DEBUG = True
+    PROFILE_REQUESTS = _env('PROFILE_REQUESTS', True, _flag)
+    PROFILE_PANEL = _env('PROFILE_PANEL', True, _flag)
+
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = _env('DB_POOL_SIZE', 10, int)
+    DB_STATEMENT_TIMEOUT = _env('DB_STATEMENT_TIMEOUT', 30000, int)
+    CACHE_TYPE = _env('CACHE_TYPE', 'sqlite')
+    RATELIMIT_STORAGE = _env('RATELIMIT_STORAGE', 'sqlite')
+    LOG_REQUESTS = _env('LOG_REQUESTS', True, _flag)
+    OPS_ALLOWED_ADDRS = [addr for addr in _env('OPS_ALLOWED_ADDRS', '127.0.0.1,::1').split(',') if addr]
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = _env('TEST_DATABASE_URL', 'sqlite://')
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': DevelopmentConfig,
+}
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import click
+from sqlalchemy import bindparam, case, false, func, select, true, update
+
+from cache import MemoryBackend, venue_page_key, artist_page_key
+from models import Venue, Artist, Show
+
+ROLLOVER_BATCH = 1000
+
+_COUNTERPARTS = {
+    Venue: (Show.venue_id, Artist, Show.artist_id),
+    Artist: (Show.artist_id, Venue, Show.venue_id),
+}
+
+
+# Venue.upcoming_shows_count and friends count shows by their is_past flag, so
+# they stay exact between rollovers; only the flag lags behind the clock.
+
+def adjust_counts(session, changes):
+    """Applies (venue_id, artist_id, upcoming_delta, past_delta) changes with
+    one executemany UPDATE per table."""
+    deltas = {Venue: {}, Artist: {}}
+    for venue_id, artist_id, upcoming, past in changes:
+        for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+            current = deltas[model].get(entity_id, (0, 0))
+            deltas[model][entity_id] = (current[0] + upcoming, current[1] + past)
+    for model, entity_deltas in deltas.items():
+        params = [{'entity_id': entity_id, 'upcoming': upcoming, 'past': past}
+                  for entity_id, (upcoming, past) in entity_deltas.items() if upcoming or past]
+        if params:
+            table = model.__table__
+            session.execute(table.update()
+                            .where(table.c.id == bindparam('entity_id'))
+                            .values(upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                                    past_shows_count=table.c.past_shows_count + bindparam('past')),
+                            params)
+
+
+def show_change(venue_id, artist_id, is_past, sign=1):
+    return venue_id, artist_id, 0 if is_past else sign, sign if is_past else 0
+
+
+def count_shows(session, shows):
+    """Adds (venue_id, artist_id, is_past) shows to the counters."""
+    adjust_counts(session, [show_change(*show) for show in shows])
+
+
+def uncount_shows(session, *criteria):
+    """Removes the shows matching ``criteria`` from the counters; call it before
+    deleting them."""
+    rows = session.execute(select(Show.venue_id, Show.artist_id, Show.is_past).where(*criteria))
+    adjust_counts(session, [show_change(*row, sign=-1) for row in rows])
+
+
+def uncount_owners(session, model, ids):
+    """Takes every show of the given venues (or artists) off the counters of
+    the artists (or venues) they play with, in a single UPDATE; call it before
+    deleting them. Their own counters go with their rows."""
+    owner_fk, counterpart, counterpart_fk = _COUNTERPARTS[model]
+
+    def count(is_past):
+        # Summed rather than filtered on is_past, as in recount().
+        return select(func.coalesce(func.sum(case((Show.is_past == is_past, 1), else_=0)), 0)) \
+            .where(counterpart_fk == counterpart.id, owner_fk.in_(ids)) \
+            .scalar_subquery()
+    table = counterpart.__table__
+    session.execute(update(table)
+                    .where(table.c.id.in_(select(counterpart_fk).where(owner_fk.in_(ids))))
+                    .values(upcoming_shows_count=table.c.upcoming_shows_count - count(false()),
+                            past_shows_count=table.c.past_shows_count - count(true())))
+
+
+def rollover(session, now=None, batch_size=ROLLOVER_BATCH):
+    """Flags shows that have started as past, moving them between counters.
+
+    Returns the ids of the venues and artists whose counts changed.
+    """
+    now = now or datetime.utcnow()
+    venue_ids, artist_ids = set(), set()
+    while True:
+        rows = session.execute(select(Show.id, Show.venue_id, Show.artist_id)
+                               .where(Show.is_past == false(), Show.date < now)
+                               .order_by(Show.date)
+                               .limit(batch_size)).all()
+        if not rows:
+            return venue_ids, artist_ids
+        session.execute(update(Show.__table__)
+                        .where(Show.__table__.c.id.in_([row.id for row in rows]))
+                        .values(is_past=true()))
+        adjust_counts(session, [(row.venue_id, row.artist_id, -1, 1) for row in rows])
+        session.commit()
+        venue_ids.update(row.venue_id for row in rows)
+        artist_ids.update(row.artist_id for row in rows)
+
+
+def recount(session):
+    """Rebuilds every counter from the Show table."""
+    for model, owner_fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        # Filtering only on the owner keeps the planner on the (owner_id, date)
+        # index; adding is_past to the WHERE makes it pick ix_Show_is_past_date.
+        def count(is_past):
+            return select(func.coalesce(func.sum(case((Show.is_past == is_past, 1), else_=0)), 0)) \
+                .where(owner_fk == model.id) \
+                .scalar_subquery()
+        session.execute(update(model.__table__).values(upcoming_shows_count=count(false()),
+                                                       past_shows_count=count(true())))
+    session.commit()
+
+
+def register(app, db):
+    @app.cli.command('rollover-shows')
+    @click.option('--recount', 'full', is_flag=True, help='Also rebuild every counter from scratch.')
+    def rollover_command(full):
+        """Moves shows that have started from upcoming to past. Run it periodically.
+
+        Cached pages are only dropped with CACHE_TYPE=sqlite; a memory cache
+        lives in each web process and keeps stale counts until its TTL runs out.
+        """
+        venue_ids, artist_ids = rollover(db.session)
+        if full:
+            recount(db.session)
+        cache = app.extensions.get('cache')
+        if cache is not None and not isinstance(cache.backend, MemoryBackend):
+            cache.delete(*[venue_page_key(venue_id) for venue_id in venue_ids],
+                         *[artist_page_key(artist_id) for artist_id in artist_ids])
+        elif venue_ids or artist_ids:
+            click.echo('The memory cache is per process; cached pages expire after CACHE_DEFAULT_TTL.', err=True)
+        click.echo('Rolled over shows for %d venues and %d artists.' % (len(venue_ids), len(artist_ids)))
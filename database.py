@@ -0,0 +1,92 @@
+import os
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(config):
+    """Builds SQLAlchemy engine options from the DB_* settings of a config."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        return options
+    options.update(pool_size=config['DB_POOL_SIZE'],
+                   max_overflow=config['DB_MAX_OVERFLOW'],
+                   pool_timeout=config['DB_POOL_TIMEOUT'])
+    timeout = config['DB_STATEMENT_TIMEOUT']
+    if timeout and backend == 'postgresql':
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % timeout}
+    elif timeout and backend == 'mysql':
+        options['connect_args'] = {'init_command': 'SET SESSION max_execution_time=%d' % timeout}
+    return options
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys, ON DELETE CASCADE included, unless asked.
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+class PoolStats:
+    """Counts connection pool activity for every engine of an app, per process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engines = {}
+        self.counts = {}
+
+    def attach(self, name, engine):
+        counts = self.counts[name] = dict.fromkeys(
+            ('connects', 'checkouts', 'checkins', 'invalidations', 'checked_out', 'peak_checked_out'), 0)
+        self.engines[name] = engine
+
+        def bump(key, delta=1):
+            with self.lock:
+                counts[key] += delta
+
+        def on_checkout(*args):
+            with self.lock:
+                counts['checkouts'] += 1
+                counts['checked_out'] += 1
+                counts['peak_checked_out'] = max(counts['peak_checked_out'], counts['checked_out'])
+
+        def on_checkin(*args):
+            with self.lock:
+                counts['checkins'] += 1
+                counts['checked_out'] -= 1
+
+        event.listen(engine, 'connect', lambda *args: bump('connects'))
+        event.listen(engine, 'checkout', on_checkout)
+        event.listen(engine, 'checkin', on_checkin)
+        event.listen(engine, 'invalidate', lambda *args: bump('invalidations'))
+
+    def snapshot(self):
+        engines = {}
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            with self.lock:
+                stats = dict(self.counts[name])
+            stats['pool'] = type(pool).__name__
+            # Only queue pools have a size and overflow.
+            for key in ('size', 'overflow', 'checkedin'):
+                if hasattr(pool, key):
+                    stats[key] = getattr(pool, key)()
+            engines[name or 'default'] = stats
+        return {"pid": os.getpid(), "engines": engines}
+
+
+def register(app, db):
+    pool_stats = PoolStats()
+    with app.app_context():
+        for name, engine in db.engines.items():
+            pool_stats.attach(name, engine)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _enable_sqlite_foreign_keys)
+    app.extensions['pool_stats'] = pool_stats
+    return pool_stats
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from models import Venue, Artist, Genre, GENRE_LINKS, genre_ids
+from search import FIELD_WEIGHTS
+
+# Columns the edit forms can change.
+EDITABLE = {
+    Venue: ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'website',
+            'seeking_talent', 'seeking_description'),
+    Artist: ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link', 'website',
+             'seeking_venue', 'seeking_description'),
+}
+
+# Changes to these show up on the counterpart's detail pages (their show
+# tiles) or in the search index; anything else only affects the entity's page.
+TILE_FIELDS = frozenset(('name', 'image_link'))
+SEARCH_FIELDS = frozenset(field for field, _, _ in FIELD_WEIGHTS)
+
+
+class EditConflict(Exception):
+    """The row was changed by someone else since the form was loaded."""
+
+
+def apply_edit(session, model, entity_id, version, values, genres):
+    """Writes only the columns of ``values`` and the genres that differ from the
+    stored row, in one UPDATE guarded by the version the form was loaded at.
+
+    Returns the names of the changed fields ('genres' included), or None when
+    the row does not exist or is archived. Raises EditConflict on a missing or
+    stale ``version``.
+    """
+    table = model.__table__
+    columns = EDITABLE[model]
+    row = session.execute(select(table.c.version, *[table.c[column] for column in columns])
+                          .where(table.c.id == entity_id, table.c.archived_at.is_(None))).first()
+    if row is None:
+        return None
+    if version is None or version != row.version:
+        raise EditConflict()
+    stored = row._mapping
+    changes = {column: values[column] for column in columns if values[column] != stored[column]}
+
+    link, owner_id = GENRE_LINKS[model]
+    current = set(session.execute(select(Genre.name)
+                                  .join(link, link.c.genre_id == Genre.id)
+                                  .where(owner_id == entity_id)).scalars())
+    added, removed = set(genres) - current, current - set(genres)
+    if not changes and not added and not removed:
+        return set()
+
+    # The UPDATE also runs for genre-only edits, to move the version on.
+    result = session.execute(update(table)
+                             .where(table.c.id == entity_id, table.c.version == row.version)
+                             .values(updated_at=datetime.utcnow(), version=table.c.version + 1, **changes))
+    if result.rowcount != 1:
+        raise EditConflict()
+    if removed:
+        session.execute(delete(link).where(owner_id == entity_id,
+                                           link.c.genre_id.in_(select(Genre.id).where(Genre.name.in_(removed)))))
+    if added:
+        ids = genre_ids(session, sorted(added))
+        session.execute(insert(link), [{'genre_id': ids[name], owner_id.name: entity_id} for name in sorted(added)])
+    return set(changes) | ({'genres'} if added or removed else set())
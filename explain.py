@@ -0,0 +1,113 @@
+import re
+from datetime import datetime
+
+import click
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from models import Venue, Artist, Show, Genre, TableVersion, venue_genres, artist_genres
+from queries import ARTISTS_PER_PAGE, area_page_query, artist_list_query, detail_query, detail_version_query, \
+    last_started_query, lookup_query, show_feed_query, table_version_query
+from search import search_query
+
+TABLES = (Venue.__tablename__, Artist.__tablename__, Show.__tablename__, Genre.__tablename__,
+          TableVersion.__tablename__, venue_genres.name, artist_genres.name)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = 'EXPLAIN QUERY PLAN ' if compiler.dialect.name == 'sqlite' else 'EXPLAIN '
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def route_queries(session):
+    """Yields (route, dialects, statement) for the query shape behind every read route.
+
+    ``dialects`` is None when the statement must be index backed everywhere.
+    """
+    now = datetime.utcnow()
+    cursor = (now, 1)
+    yield '/venues', None, area_page_query(session).statement
+    yield '/venues?state=', None, area_page_query(session, state='CA').statement
+    yield '/venues?genre=', None, area_page_query(session, genre='Jazz').statement
+    yield '/venues/<id>', None, detail_query(Venue, 1, now)
+    yield '/venues/<id>?past=', None, detail_query(Venue, 1, now, cursor)
+    yield '/artists', None, artist_list_query().limit(ARTISTS_PER_PAGE + 1)
+    yield '/artists?genre=', None, artist_list_query('Jazz').limit(ARTISTS_PER_PAGE + 1)
+    yield '/artists?cursor=', None, artist_list_query(after=('m', 1)).limit(ARTISTS_PER_PAGE + 1)
+    yield '/artists?start=', None, artist_list_query(start='M').limit(ARTISTS_PER_PAGE + 1)
+    yield '/artists/<id>', None, detail_query(Artist, 1, now)
+    yield '/artists/<id>?past=', None, detail_query(Artist, 1, now, cursor)
+    for mode in ('all', 'upcoming', 'past'):
+        yield '/shows?mode=' + mode, None, show_feed_query(mode, None, now)
+        yield '/shows?mode=' + mode + '&cursor=', None, show_feed_query(mode, cursor, now)
+    yield '/api/v1/venues/lookup', None, lookup_query(Venue, 'the')
+    yield '/api/v1/artists/lookup', None, lookup_query(Artist, 'blue')
+    # The conditional GET validators, run before every list and detail page.
+    yield '/venues (validator)', None, table_version_query(Venue)
+    yield '/shows (validator)', None, table_version_query(Show, Venue, Artist)
+    yield '/shows (validator, last started)', None, last_started_query(now)
+    yield '/venues/<id> (validator)', None, detail_version_query(Venue, 1, now)
+    yield '/artists/<id> (validator)', None, detail_version_query(Artist, 1, now)
+    # Other databases search the in-process index instead.
+    yield '/venues/search', ('postgresql',), search_query(Venue, 'term')
+    yield '/artists/search', ('postgresql',), search_query(Artist, 'term')
+
+
+def full_scans(dialect, plan):
+    """Returns the tables the plan reads without going through an index."""
+    scanned = set()
+    for line in plan:
+        if dialect == 'sqlite':
+            match = re.match(r'\s*SCAN (\w+)(.*)', line)
+            if match and 'INDEX' not in match.group(2):
+                scanned.add(match.group(1))
+        else:
+            match = re.search(r'Seq Scan on "?(\w+)"?', line)
+            if match:
+                scanned.add(match.group(1))
+    return scanned.intersection(TABLES)
+
+
+def check_indexes(session):
+    """Runs EXPLAIN for every route query and returns [(route, plan, full_scans)]."""
+    dialect = session.get_bind().dialect.name
+    report = []
+    if dialect == 'postgresql':
+        # Small tables are cheaper to scan, which would hide a missing index.
+        session.execute(text('SET LOCAL enable_seqscan = off'))
+    try:
+        for route, dialects, statement in route_queries(session):
+            if dialects is not None and dialect not in dialects:
+                continue
+            plan = [row[-1] for row in session.execute(Explain(statement))]
+            report.append((route, plan, full_scans(dialect, plan)))
+    finally:
+        session.rollback()
+    return report
+
+
+def register(app, db):
+    @app.cli.command('check-indexes')
+    @click.option('--verbose', '-v', is_flag=True, help='Print the full plan of every query.')
+    def check_indexes_command(verbose):
+        """Fails if any route query plans a full table scan."""
+        failed = False
+        for route, plan, scanned in check_indexes(db.session):
+            failed = failed or bool(scanned)
+            status = 'FAIL' if scanned else 'ok'
+            detail = ' (full scan of %s)' % ', '.join(sorted(scanned)) if scanned else ''
+            click.echo('%-4s %s%s' % (status, route, detail))
+            if verbose or scanned:
+                for line in plan:
+                    click.echo('       ' + line)
+        if failed:
+            raise SystemExit(1)
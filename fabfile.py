@@ -1,3 +1,5 @@
+import os
+
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
@@ -5,12 +7,24 @@ from fabric.contrib.console import confirm
 # prepare for deployment
 
 
-def test():
+BASELINE = "benchmarks/baselines/{}.json"
+
+
+def baseline(name="default"):
+    local("python -m benchmarks.load --save " + BASELINE.format(name))
+
+
+def test(name="default"):
+    # Route benchmarks against a saved baseline; DATABASE_URL must point at a
+    # database filled by "python -m benchmarks.generate". Baselines depend on
+    # the machine, so none is committed: record one with "fab baseline" first.
+    if not os.path.isfile(BASELINE.format(name)):
+        abort("No baseline at {}; record one with \"fab baseline:{}\" first.".format(BASELINE.format(name), name))
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.load --compare " + BASELINE.format(name)
         )
-    if result.failed and not confirm("Tests failed. Continue?"):
+    if result.failed and not confirm("Benchmarks regressed. Continue?"):
         abort("Aborted at user request.")
 
 
@@ -0,0 +1,32 @@
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+SHORT_FORMAT = "EE MM, dd"
+
+
+@lru_cache(maxsize=None)
+def datetime_formatter(pattern, locale):
+    """Returns a function formatting datetimes with a pattern parsed once."""
+    compiled = babel.dates.parse_pattern(pattern)
+    locale = Locale.parse(locale)
+    return lambda value: compiled.apply(value, locale)
+
+
+@lru_cache(maxsize=4096)
+def _format(value, f, locale):
+    # Show pages repeat the same few timestamps many times over.
+    return datetime_formatter(DATETIME_FORMATS.get(f, SHORT_FORMAT), locale)(value)
+
+
+def format_datetime(value, f='medium', locale='en'):
+    if isinstance(value, str):
+        # Strings are still accepted, at the cost of parsing them first.
+        value = dateutil.parser.parse(value)
+    return _format(value, f, locale)
@@ -1,7 +1,11 @@
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Length
+from sqlalchemy import select
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Length, ValidationError
+from wtforms.widgets import HiddenInput
+
+from models import db, Venue, Artist
 
 genres_choices = (
     ('Alternative', 'Alternative'), ('Blues', 'Blues'), ('Classical', 'Classical'), ('Country', 'Country'),
@@ -23,6 +27,22 @@ state_choices = (
 )
 
 
+class Exists(object):
+    """Checks that the field holds the id of an existing, unarchived row with a
+    single primary key lookup, instead of listing every id as a choice."""
+
+    def __init__(self, model, message=None):
+        self.model = model
+        self.message = message
+
+    def __call__(self, form, field):
+        if field.data is None:
+            return
+        stmt = select(self.model.id).where(self.model.id == field.data, self.model.archived_at.is_(None))
+        if db.session.scalar(stmt) is None:
+            raise ValidationError(self.message or 'No %s with id %s.' % (self.model.__tablename__.lower(), field.data))
+
+
 class ShowForm(Form):
     name = StringField(
         'name', validators=[
@@ -30,13 +50,13 @@ class ShowForm(Form):
             Length(max=120),
         ]
     )
-    artist_id = SelectField(
+    artist_id = IntegerField(
         'artist_id',
-        # validators=[DataRequired()],
+        validators=[DataRequired(), Exists(Artist)],
     )
-    venue_id = SelectField(
+    venue_id = IntegerField(
         'venue_id',
-        # validators=[DataRequired()],
+        validators=[DataRequired(), Exists(Venue)],
     )
     start_time = DateTimeField(
         'start_time',
@@ -186,3 +206,17 @@ class ArtistForm(Form):
             Length(max=500),
         ]
     )
+
+
+class EditVenueForm(VenueForm):
+    # The version the edit form was loaded at; see edits.apply_edit.
+    version = IntegerField(
+        'version', widget=HiddenInput(), validators=[DataRequired()]
+    )
+
+
+class EditArtistForm(ArtistForm):
+    # The version the edit form was loaded at; see edits.apply_edit.
+    version = IntegerField(
+        'version', widget=HiddenInput(), validators=[DataRequired()]
+    )
@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import func, insert, select, text
+from werkzeug.datastructures import MultiDict
+
+from cache import venue_page_key, artist_page_key, artist_index_key
+from counters import count_shows
+from forms import VenueForm, ArtistForm, ShowForm, genres_choices
+from models import Venue, Artist, Show, GENRE_LINKS, genre_ids, mark_written
+
+BATCH_SIZE = 1000
+
+# Columns copied from the validated form onto each row, per importable kind.
+KINDS = {
+    'venues': (Venue, VenueForm, ('name', 'city', 'state', 'address', 'phone', 'image_link', 'website',
+                                  'facebook_link', 'seeking_talent', 'seeking_description')),
+    'artists': (Artist, ArtistForm, ('name', 'city', 'state', 'phone', 'image_link', 'website',
+                                     'facebook_link', 'seeking_venue', 'seeking_description')),
+    'shows': (Show, ShowForm, ('name',)),
+}
+
+
+class RowError(Exception):
+    pass
+
+
+# ----------------------------------------------------------------------------#
+# Input and rejects
+# ----------------------------------------------------------------------------#
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            # Multi-valued genres are ';'-separated, as in the CSV export.
+            if row.get('genres') is not None:
+                row['genres'] = [genre for genre in row['genres'].split(';') if genre]
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RejectWriter:
+    def __init__(self, stream, file_format):
+        self.stream = stream
+        self.file_format = file_format
+        self.writer = None
+        self.count = 0
+
+    def write(self, line_number, row, error):
+        self.count += 1
+        if self.stream is None:
+            return
+        if self.file_format == 'ndjson':
+            self.stream.write(json.dumps({"line": line_number, "error": error, "row": row}) + '\n')
+            return
+        row = dict(row, line=line_number, error=error)
+        if isinstance(row.get('genres'), list):
+            row['genres'] = ';'.join(row['genres'])
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.stream, fieldnames=list(row), extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow(row)
+
+
+# ----------------------------------------------------------------------------#
+# Validation
+# ----------------------------------------------------------------------------#
+
+def to_formdata(row):
+    data = MultiDict()
+    for key, value in row.items():
+        for item in (value if isinstance(value, list) else [value]):
+            if isinstance(item, bool):
+                # BooleanField treats any non-empty string but 'false' as checked.
+                item = 'y' if item else ''
+            data.add(key, '' if item is None else str(item))
+    return data
+
+
+def validate(kind, row):
+    """Validates a row with the same form the web handlers use and returns the
+    values to insert."""
+    model, form_class, columns = KINDS[kind]
+    form = form_class(formdata=to_formdata(row), meta={'csrf': False})
+    if kind == 'shows':
+        # Foreign keys are resolved per batch instead of against full choice lists.
+        del form.artist_id, form.venue_id
+    if not form.validate():
+        raise RowError('; '.join('%s: %s' % (field, ', '.join(errors)) for field, errors in form.errors.items()))
+    values = {column: getattr(form, column).data for column in columns}
+    if kind == 'shows':
+        values['date'] = form.start_time.data
+        values['venue_ref'] = row.get('venue_id') or row.get('venue_name')
+        values['artist_ref'] = row.get('artist_id') or row.get('artist_name')
+        if not values['venue_ref'] or not values['artist_ref']:
+            raise RowError('shows need venue_id or venue_name and artist_id or artist_name')
+    else:
+        values['genres'] = form.genres.data
+    return values
+
+
+# ----------------------------------------------------------------------------#
+# Batch inserts
+# ----------------------------------------------------------------------------#
+
+def resolve(session, model, refs):
+    """Maps the given ids or names to ids with one query each; unknown or
+    ambiguous names are left out."""
+    ids = {ref for ref in refs if str(ref).isdigit()}
+    names = set(refs) - ids
+    resolved = {}
+    if ids:
+        found = session.execute(select(model.id).where(model.id.in_([int(ref) for ref in ids]))).scalars()
+        resolved.update((str(found_id), found_id) for found_id in found)
+    if names:
+        rows = session.execute(select(model.name, func.min(model.id))
+                               .where(model.name.in_(names))
+                               .group_by(model.name)
+                               .having(func.count(model.id) == 1))
+        resolved.update((name, found_id) for name, found_id in rows)
+    return resolved
+
+
+def copy_rows(session, table, rows):
+    """Inserts rows with COPY on Postgres and executemany everywhere else."""
+    if not rows:
+        return
+    if session.get_bind().dialect.name != 'postgresql':
+        session.execute(insert(table), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'
+                       % (table.name, ', '.join('"%s"' % column for column in columns)), buffer)
+    # Unlike session.execute, the raw cursor is invisible to the TableVersion bump.
+    mark_written(session, table.name)
+
+
+def allocate_ids(session, model, rows):
+    """Assigns primary keys up front so genre links can be written in the same
+    batch, straight from the sequence on Postgres."""
+    if session.get_bind().dialect.name == 'postgresql':
+        ids = session.execute(text("SELECT nextval(pg_get_serial_sequence('\"%s\"', 'id')) "
+                                   "FROM generate_series(1, :n)" % model.__tablename__),
+                              {'n': len(rows)}).scalars().all()
+    else:
+        # Single writer assumed, as for any bulk load into SQLite.
+        start = (session.execute(select(func.max(model.id))).scalar() or 0) + 1
+        ids = range(start, start + len(rows))
+    for row, row_id in zip(rows, ids):
+        row['id'] = row_id
+
+
+def insert_batch(session, kind, batch, rejects):
+    """Inserts one batch of (line_number, raw_row, values) and returns the
+    number of rows written."""
+    model = KINDS[kind][0]
+    now = datetime.utcnow()
+    stamps = {'created_at': now, 'updated_at': now, 'version': 1}
+    touched = {}
+    if kind == 'shows':
+        venues = resolve(session, Venue, {values['venue_ref'] for _, _, values in batch})
+        artists = resolve(session, Artist, {values['artist_ref'] for _, _, values in batch})
+        rows = []
+        for line_number, raw, values in batch:
+            venue_id = venues.get(str(values.pop('venue_ref')))
+            artist_id = artists.get(str(values.pop('artist_ref')))
+            if venue_id is None or artist_id is None:
+                rejects.write(line_number, raw, 'unknown or ambiguous %s' % ('venue' if venue_id is None else 'artist'))
+                continue
+            rows.append(dict(values, venue_id=venue_id, artist_id=artist_id, is_past=values['date'] < now, **stamps))
+            touched.setdefault('venues', set()).add(venue_id)
+            touched.setdefault('artists', set()).add(artist_id)
+        copy_rows(session, model.__table__, rows)
+        count_shows(session, [(row['venue_id'], row['artist_id'], row['is_past']) for row in rows])
+    else:
+        rows = [dict(values, **stamps) for _, _, values in batch]
+        genres = [row.pop('genres') for row in rows]
+        allocate_ids(session, model, rows)
+        copy_rows(session, model.__table__, rows)
+        ids = genre_ids(session, sorted({name for names in genres for name in names}))
+        link, owner_id = GENRE_LINKS[model]
+        copy_rows(session, link, [{'genre_id': ids[name], owner_id.name: row['id']}
+                                  for row, names in zip(rows, genres) for name in dict.fromkeys(names)])
+    session.commit()
+    return len(rows), touched
+
+
+def import_rows(session, kind, rows, rejects, batch_size=BATCH_SIZE, on_batch=None):
+    inserted = 0
+    batch = []
+    for line_number, row in enumerate(rows, start=1):
+        try:
+            batch.append((line_number, row, validate(kind, row)))
+        except RowError as error:
+            rejects.write(line_number, row, str(error))
+        if len(batch) >= batch_size:
+            count, touched = insert_batch(session, kind, batch, rejects)
+            inserted += count
+            batch = []
+            if on_batch:
+                on_batch(inserted, touched)
+    if batch:
+        count, touched = insert_batch(session, kind, batch, rejects)
+        inserted += count
+        if on_batch:
+            on_batch(inserted, touched)
+    return inserted
+
+
+def register(app, db):
+    @app.cli.command('import')
+    @click.argument('kind', type=click.Choice(sorted(KINDS)))
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+                  help='Defaults to the file extension.')
+    @click.option('--rejects', type=click.File('w', encoding='utf-8'),
+                  help='Where to write rows that fail validation.')
+    @click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+    def import_command(kind, source, file_format, rejects, batch_size):
+        """Bulk loads venues, artists or shows from a CSV or NDJSON file."""
+        file_format = file_format or ('ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+        reject_writer = RejectWriter(rejects, file_format)
+        cache = app.extensions.get('cache')
+        started = time.monotonic()
+
+        def report(inserted, touched):
+            if cache is not None:
+                cache.delete(*[venue_page_key(venue_id) for venue_id in touched.get('venues', ())],
+                             *[artist_page_key(artist_id) for artist_id in touched.get('artists', ())])
+                if kind == 'artists':
+                    cache.delete(*[artist_index_key(genre) for genre in (None, *[name for name, _ in genres_choices])])
+            elapsed = time.monotonic() - started
+            click.echo('%d rows imported, %d rejected (%.0f rows/s)'
+                       % (inserted, reject_writer.count, inserted / elapsed if elapsed else 0), err=True)
+
+        inserted = import_rows(db.session, kind, read_rows(source, file_format), reject_writer,
+                               batch_size, on_batch=report)
+        elapsed = time.monotonic() - started
+        click.echo('Imported %d %s in %.1fs (%.0f rows/s); %d rejected.'
+                   % (inserted, kind, elapsed, inserted / elapsed if elapsed else 0, reject_writer.count))
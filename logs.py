@@ -0,0 +1,160 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Request ids accepted from an upstream proxy; anything else gets a fresh one.
+_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+_TRACEBACKS = logging.Formatter()
+
+CONTEXT_FIELDS = ('request_id', 'method', 'path', 'route', 'status', 'latency_ms')
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records made during a request with its id, route and the time
+    spent on it so far."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.route = request.url_rule.rule if request.url_rule else None
+            started = g.get('request_started')
+            if started is not None and getattr(record, 'latency_ms', None) is None:
+                record.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to the listener thread without ever blocking: when the
+    queue is full the record is dropped and counted instead."""
+
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Resolved on the request thread, while the arguments and traceback
+        # are still around; the listener only gets plain values.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class DrainingListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Shutting down may wait for a full queue; request threads never do.
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogPipeline:
+    """A bounded queue in front of ``handler``, drained by a background thread."""
+
+    def __init__(self, handler, maxsize):
+        handler.setFormatter(JsonFormatter())
+        self.maxsize = maxsize
+        self.queue_handler = BoundedQueueHandler(maxsize)
+        self.queue_handler.addFilter(RequestContextFilter())
+        self.queue_handler.pipeline = self
+        self.listener = DrainingListener(self.queue_handler.queue, handler, respect_handler_level=True)
+        self.running = False
+
+    def start(self):
+        self.listener.start()
+        self.running = True
+
+    def stop(self):
+        # Flushes whatever is still queued; safe to call twice.
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+    def stats(self):
+        return {
+            "queued": self.queue_handler.queue.qsize(),
+            "capacity": self.maxsize,
+            "dropped": self.queue_handler.dropped,
+        }
+
+
+def register(app):
+    access = logging.getLogger(app.logger.name + '.access')
+
+    @app.before_request
+    def start_request():
+        g.request_started = time.perf_counter()
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def finish_request(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        if app.config['LOG_REQUESTS']:
+            access.info('%s %s %d', request.method, request.full_path.rstrip('?'), response.status_code,
+                        extra={'status': response.status_code})
+        return response
+
+    if app.debug:
+        # Flask's own stderr handler is more readable while developing.
+        return None
+    # create_app() can run more than once in a process (CLI, benchmarks), and
+    # every app shares the same named logger.
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, BoundedQueueHandler):
+            app.logger.removeHandler(handler)
+            handler.pipeline.stop()
+    if app.config['LOG_FILE']:
+        handler = logging.FileHandler(app.config['LOG_FILE'], delay=True)
+    else:
+        handler = logging.StreamHandler()
+    pipeline = LogPipeline(handler, app.config['LOG_QUEUE_SIZE'])
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(pipeline.queue_handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    app.extensions['logs'] = pipeline
+    return pipeline
@@ -0,0 +1,292 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+from ops import operators_only
+
+# Seconds; the same buckets serve request, query and render times.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Finished threads' shards are folded together once this many pile up.
+MAX_SHARDS = 64
+
+METRICS = {
+    'fyyur_http_requests_total': ('counter', 'Requests handled, by route, method and status.'),
+    'fyyur_http_request_duration_seconds': ('histogram', 'Time to build each response, by route.'),
+    'fyyur_db_queries_total': ('counter', 'SQL statements run while handling requests, by route.'),
+    'fyyur_db_query_duration_seconds': ('histogram', 'Time spent in each SQL statement, by route.'),
+    'fyyur_template_render_duration_seconds': ('histogram', 'Template rendering time per request, by route.'),
+    'fyyur_cache_hits_total': ('counter', 'Page and data cache hits.'),
+    'fyyur_cache_misses_total': ('counter', 'Page and data cache misses.'),
+    'fyyur_log_records_dropped_total': ('counter', 'Log records dropped because the log queue was full.'),
+    'fyyur_db_pool_checked_out': ('gauge', 'Connections currently checked out of the pool.'),
+    'fyyur_db_pool_overflow': ('gauge', 'Connections open beyond the pool size.'),
+    'fyyur_db_pool_size': ('gauge', 'Configured pool size.'),
+}
+
+
+def _new_shard():
+    return {'counters': {}, 'histograms': {}}
+
+
+def _merge(into, shard):
+    # list() copies in one step, so a shard still being written to is safe to read.
+    for key, value in list(shard['counters'].items()):
+        into['counters'][key] = into['counters'].get(key, 0) + value
+    for key, buckets in list(shard['histograms'].items()):
+        merged = into['histograms'].get(key)
+        if merged is None:
+            into['histograms'][key] = list(buckets)
+        else:
+            into['histograms'][key] = [a + b for a, b in zip(merged, buckets)]
+
+
+class Registry:
+    """Counters and histograms kept in one shard per thread, so recording never
+    takes a lock; a scrape folds the shards together."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _new_shard()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) > MAX_SHARDS:
+                    self._retire()
+        return shard
+
+    def _retire(self):
+        # The threaded dev server starts a thread per request.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = live
+
+    def inc(self, name, labels=(), amount=1):
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # One slot per bucket, one for +Inf, then the sum.
+            histogram = histograms[key] = [0] * (len(self.buckets) + 2)
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def snapshot(self):
+        merged = _new_shard()
+        with self._lock:
+            self._retire()
+            _merge(merged, self._retired)
+            for _, shard in self._shards:
+                _merge(merged, shard)
+        return merged
+
+
+# ----------------------------------------------------------------------------#
+# Process-wide samples
+# ----------------------------------------------------------------------------#
+
+def process_samples(app, pid_label):
+    """Counters and gauges read from the cache, log pipeline and pools at
+    scrape time: (counters, gauges) as {(name, labels): value}."""
+    counters, gauges = {}, {}
+    cache = app.extensions.get('cache')
+    if cache is not None:
+        stats = cache.stats()
+        counters[('fyyur_cache_hits_total', pid_label)] = stats['hits']
+        counters[('fyyur_cache_misses_total', pid_label)] = stats['misses']
+    logs = app.extensions.get('logs')
+    if logs is not None:
+        counters[('fyyur_log_records_dropped_total', pid_label)] = logs.stats()['dropped']
+    pool_stats = app.extensions.get('pool_stats')
+    if pool_stats is not None:
+        for engine, stats in pool_stats.snapshot()['engines'].items():
+            labels = (('engine', engine),) + pid_label
+            gauges[('fyyur_db_pool_checked_out', labels)] = stats['checked_out']
+            # Only queue pools have a size and overflow.
+            if 'overflow' in stats:
+                gauges[('fyyur_db_pool_overflow', labels)] = max(stats['overflow'], 0)
+                gauges[('fyyur_db_pool_size', labels)] = stats['size']
+    return counters, gauges
+
+
+# ----------------------------------------------------------------------------#
+# Several worker processes
+# ----------------------------------------------------------------------------#
+
+class ProcessFiles:
+    """With METRICS_DIR set, every worker writes its snapshot to <pid>.json in
+    the background and a scrape of any worker adds up all of them."""
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.pid = None
+
+    def path(self, pid):
+        return os.path.join(self.directory, '%d.json' % pid)
+
+    def start(self, collect):
+        # Threads do not survive a fork, so each worker starts its own.
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+
+        def flush():
+            while True:
+                time.sleep(self.interval)
+                self.write(*collect())
+
+        threading.Thread(target=flush, name='metrics-flush', daemon=True).start()
+
+    def write(self, shard, gauges):
+        body = {
+            "counters": [[name, labels, value] for (name, labels), value in shard['counters'].items()],
+            "histograms": [[name, labels, value] for (name, labels), value in shard['histograms'].items()],
+            "gauges": [[name, labels, value] for (name, labels), value in gauges.items()],
+        }
+        path = self.path(os.getpid())
+        with open(path + '.tmp', 'w') as out:
+            json.dump(body, out)
+        os.replace(path + '.tmp', path)
+
+    def read_others(self):
+        """Yields (shard, gauges) for the other workers. Gauges of workers that
+        stopped writing are left out; their counters still count."""
+        own = self.path(os.getpid())
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as source:
+                    body = json.load(source)
+                fresh = time.time() - os.path.getmtime(path) < 3 * self.interval
+            except (OSError, ValueError):
+                continue
+
+            def entries(kind):
+                return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in body[kind]}
+
+            yield {'counters': entries('counters'), 'histograms': entries('histograms')}, \
+                entries('gauges') if fresh else {}
+
+
+# ----------------------------------------------------------------------------#
+# Exposition
+# ----------------------------------------------------------------------------#
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(shard, gauges, buckets=BUCKETS):
+    """Prometheus text format, version 0.0.4."""
+    samples = {}
+    for (name, labels), value in sorted(list(shard['counters'].items()) + list(gauges.items())):
+        samples.setdefault(name, []).append('%s%s %s' % (name, _labels(labels), _number(value)))
+    for (name, labels), histogram in sorted(shard['histograms'].items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), histogram):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (name, _labels(labels, (('le', bound),)), cumulative))
+        lines.append('%s_sum%s %s' % (name, _labels(labels), _number(histogram[-1])))
+        lines.append('%s_count%s %d' % (name, _labels(labels), cumulative))
+    out = []
+    for name in sorted(samples):
+        kind, description = METRICS.get(name, ('untyped', ''))
+        out.append('# HELP %s %s' % (name, description))
+        out.append('# TYPE %s %s' % (name, kind))
+        out.extend(samples[name])
+    return '\n'.join(out) + '\n'
+
+
+def register(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return None
+    registry = Registry()
+    files = ProcessFiles(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_SECONDS']) \
+        if app.config['METRICS_DIR'] else None
+
+    def collect():
+        shard = registry.snapshot()
+        # Workers are told apart by pid once their samples are added up.
+        counters, gauges = process_samples(app, (('pid', str(os.getpid())),) if files else ())
+        shard['counters'].update(counters)
+        return shard, gauges
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        if files is not None:
+            files.start(collect)
+
+    def record(route, method, status, started, profile):
+        labels = (('route', route),)
+        registry.inc('fyyur_http_requests_total', (('method', method), ('route', route), ('status', status)))
+        registry.observe('fyyur_http_request_duration_seconds', labels, time.perf_counter() - started)
+        # Filled in by profiling.py, which collects whenever metrics are on.
+        if profile is not None:
+            registry.inc('fyyur_db_queries_total', labels, len(profile.queries))
+            for _, duration in profile.queries:
+                registry.observe('fyyur_db_query_duration_seconds', labels, duration)
+            if profile.render_time:
+                registry.observe('fyyur_template_render_duration_seconds', labels, profile.render_time)
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        # Unmatched URLs share one label, so random paths cannot blow up the series.
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        args = (route, request.method, str(response.status_code), started, g.get('profile'))
+        if response.is_streamed:
+            # Streamed pages render (and query) while they are sent.
+            response.call_on_close(lambda: record(*args))
+        else:
+            record(*args)
+        return response
+
+    def metrics_view():
+        shard, gauges = collect()
+        if files is not None:
+            for other, other_gauges in files.read_others():
+                _merge(shard, other)
+                gauges.update(other_gauges)
+        return Response(render(shard, gauges), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', operators_only(metrics_view))
+    app.extensions['metrics'] = registry
+    return registry
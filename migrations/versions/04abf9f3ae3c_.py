@@ -0,0 +1,44 @@
+"""add indexes for the show, venue and artist access paths
+
+Revision ID: 04abf9f3ae3c
+Revises: 6ebc9c0ed3e6
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04abf9f3ae3c'
+down_revision = '6ebc9c0ed3e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_venue_id_date', 'Show', ['venue_id', 'date'], unique=False)
+    op.create_index('ix_Show_artist_id_date', 'Show', ['artist_id', 'date'], unique=False)
+    op.create_index('ix_Show_date_id', 'Show', ['date', 'id'], unique=False)
+    op.create_index('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+
+    # ilike '%term%' can only use an index through trigrams, which is Postgres only.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+        op.drop_index('ix_Venue_name_trgm', table_name='Venue')
+
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.drop_index('ix_Show_date_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_date', table_name='Show')
+    op.drop_index('ix_Show_venue_id_date', table_name='Show')
@@ -0,0 +1,57 @@
+"""add materialized show counters to venues and artists
+
+Revision ID: 3f8a61d2c9b4
+Revises: ae585ad1843d
+Create Date: 2026-10-18 15:02:47.118204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a61d2c9b4'
+down_revision = 'ae585ad1843d'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.add_column(sa.Column('is_past', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_Show_is_past_date', 'Show', ['is_past', 'date'], unique=False)
+    show = sa.table('Show', sa.column('date', sa.DateTime()), sa.column('is_past', sa.Boolean()),
+                    sa.column('venue_id', sa.Integer()), sa.column('artist_id', sa.Integer()))
+    # Shows are stored in naive UTC, so compare against the same clock.
+    op.execute(show.update().where(show.c.date < datetime.utcnow()).values(is_past=True))
+
+    for table, owner_fk in OWNERS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), nullable=False,
+                                          server_default=sa.text('0')))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), nullable=False,
+                                          server_default=sa.text('0')))
+        owner = sa.table(table, sa.column('id', sa.Integer()), sa.column('upcoming_shows_count', sa.Integer()),
+                         sa.column('past_shows_count', sa.Integer()))
+
+        # Filtering only on the owner keeps the planner on the (owner_id, date) index.
+        def count(is_past):
+            return sa.select(sa.func.coalesce(sa.func.sum(sa.case((show.c.is_past == is_past, 1), else_=0)), 0)) \
+                .where(show.c[owner_fk] == owner.c.id) \
+                .scalar_subquery()
+
+        op.execute(owner.update().values(upcoming_shows_count=count(sa.false()), past_shows_count=count(sa.true())))
+
+
+def downgrade():
+    for table, _ in reversed(OWNERS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+    op.drop_index('ix_Show_is_past_date', table_name='Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('is_past')
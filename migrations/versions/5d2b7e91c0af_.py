@@ -0,0 +1,29 @@
+"""add case-insensitive name indexes for the show form lookups
+
+Revision ID: 5d2b7e91c0af
+Revises: 3f8a61d2c9b4
+Create Date: 2026-10-18 17:21:05.463118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2b7e91c0af'
+down_revision = '3f8a61d2c9b4'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # Must match queries.lookup_query() for the planner to pick it up.
+    for table in TABLES:
+        op.create_index('ix_%s_name_lower' % table, table, [sa.text('lower(name)'), 'id'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index('ix_%s_name_lower' % table, table_name=table)
@@ -0,0 +1,39 @@
+"""add weighted full-text search indexes for venues and artists
+
+Revision ID: 9c1e2d4b7a60
+Revises: 04abf9f3ae3c
+Create Date: 2026-10-18 11:03:27.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e2d4b7a60'
+down_revision = '04abf9f3ae3c'
+branch_labels = None
+depends_on = None
+
+# Must match search.search_document() exactly for the planner to pick it up.
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(genres, '')), 'C') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(state, '')), 'D')"
+)
+
+
+def upgrade():
+    # Other databases fall back to the in-process index in search.py.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE INDEX "ix_Venue_search" ON "Venue" USING gin ((%s))' % SEARCH_DOCUMENT)
+    op.execute('CREATE INDEX "ix_Artist_search" ON "Artist" USING gin ((%s))' % SEARCH_DOCUMENT)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_Artist_search', table_name='Artist')
+    op.drop_index('ix_Venue_search', table_name='Venue')
@@ -0,0 +1,117 @@
+"""move genres into Genre and association tables
+
+Revision ID: ac571811423b
+Revises: 9c1e2d4b7a60
+Create Date: 2026-10-18 12:20:54.771902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac571811423b'
+down_revision = '9c1e2d4b7a60'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'VenueGenre', 'venue_id'), ('Artist', 'ArtistGenre', 'artist_id'))
+
+# Must match search.search_document() exactly for the planner to pick it up.
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(state, '')), 'D')"
+)
+
+OLD_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(genres, '')), 'C') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(state, '')), 'D')"
+)
+
+genre_table = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def parse_genres(value):
+    # Rows were written as Postgres array literals, e.g. {Jazz,"Heavy Metal"}.
+    names = (name.strip().strip('"') for name in (value or '').strip('{}').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def rebuild_search_indexes(document):
+    for owner, _, _ in OWNERS:
+        op.execute('DROP INDEX IF EXISTS "ix_%s_search"' % owner)
+        op.execute('CREATE INDEX "ix_%s_search" ON "%s" USING gin ((%s))' % (owner, owner, document))
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for owner, link, owner_fk in OWNERS:
+        op.create_table(link,
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.Column(owner_fk, sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([owner_fk], [owner + '.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('genre_id', owner_fk)
+        )
+        op.create_index('ix_%s_%s' % (link, owner_fk), link, [owner_fk], unique=False)
+
+    bind = op.get_bind()
+    owner_genres = {}
+    for owner, _, _ in OWNERS:
+        owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        owner_genres[owner] = [(owner_id, parse_genres(genres)) for owner_id, genres
+                               in bind.execute(sa.select(owner_table.c.id, owner_table.c.genres))]
+    names = sorted({name for rows in owner_genres.values() for _, genres in rows for name in genres})
+    if names:
+        op.bulk_insert(genre_table, [{'name': name} for name in names])
+    genre_ids = dict((name, genre_id) for genre_id, name
+                     in bind.execute(sa.select(genre_table.c.id, genre_table.c.name)))
+    for owner, link, owner_fk in OWNERS:
+        links = [{'genre_id': genre_ids[name], owner_fk: owner_id}
+                 for owner_id, genres in owner_genres[owner] for name in genres]
+        if links:
+            link_table = sa.table(link, sa.column('genre_id', sa.Integer), sa.column(owner_fk, sa.Integer))
+            op.bulk_insert(link_table, links)
+
+    if bind.dialect.name == 'postgresql':
+        rebuild_search_indexes(SEARCH_DOCUMENT)
+    for owner, _, _ in OWNERS:
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for owner, link, owner_fk in OWNERS:
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=500), nullable=True))
+        owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        link_table = sa.table(link, sa.column('genre_id', sa.Integer), sa.column(owner_fk, sa.Integer))
+        genres = {}
+        rows = bind.execute(sa.select(link_table.c[owner_fk], genre_table.c.name)
+                            .join(genre_table, genre_table.c.id == link_table.c.genre_id)
+                            .order_by(link_table.c[owner_fk], genre_table.c.name))
+        for owner_id, name in rows:
+            genres.setdefault(owner_id, []).append('"%s"' % name if ' ' in name else name)
+        bind.execute(owner_table.update().values(genres='{}'))
+        for owner_id, names in genres.items():
+            bind.execute(owner_table.update()
+                         .where(owner_table.c.id == owner_id)
+                         .values(genres='{%s}' % ','.join(names)))
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.alter_column('genres', existing_type=sa.String(length=500), nullable=False)
+
+    if bind.dialect.name == 'postgresql':
+        rebuild_search_indexes(OLD_SEARCH_DOCUMENT)
+    for owner, link, owner_fk in reversed(OWNERS):
+        op.drop_index('ix_%s_%s' % (link, owner_fk), table_name=link)
+        op.drop_table(link)
+    op.drop_table('Genre')
@@ -0,0 +1,40 @@
+"""add created_at, updated_at and version to venues, artists and shows
+
+Revision ID: ae585ad1843d
+Revises: ac571811423b
+Create Date: 2026-10-18 13:41:09.338127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ae585ad1843d'
+down_revision = 'ac571811423b'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # Existing rows are stamped with the migration time and start at version 1.
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=False,
+                                          server_default=sa.text('CURRENT_TIMESTAMP')))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                          server_default=sa.text('CURRENT_TIMESTAMP')))
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False,
+                                          server_default=sa.text('1')))
+        op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
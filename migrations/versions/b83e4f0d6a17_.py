@@ -0,0 +1,34 @@
+"""add archived_at to venues and artists
+
+Revision ID: b83e4f0d6a17
+Revises: 5d2b7e91c0af
+Create Date: 2026-10-18 18:40:12.309857
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e4f0d6a17'
+down_revision = '5d2b7e91c0af'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        # Batch mode rebuilds the table on SQLite and cannot reflect the
+        # lower(name) index from 5d2b7e91c0af, so it is put back by hand.
+        op.drop_index('ix_%s_name_lower' % table, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('archived_at')
+        op.create_index('ix_%s_name_lower' % table, table, [sa.text('lower(name)'), 'id'], unique=False)
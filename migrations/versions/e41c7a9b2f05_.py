@@ -0,0 +1,35 @@
+"""add per-table versions for the list page validators
+
+Revision ID: e41c7a9b2f05
+Revises: b83e4f0d6a17
+Create Date: 2026-10-19 09:12:44.518203
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c7a9b2f05'
+down_revision = 'b83e4f0d6a17'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    table_version = op.create_table(
+        'TableVersion',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [{'name': name, 'version': 0, 'updated_at': datetime.utcnow()} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('TableVersion')
@@ -1,45 +1,212 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import declared_attr
+
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# The (genre_id, owner_id) primary keys back the ?genre= filters; the owner
+# index backs loading the genres of a single venue or artist.
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_VenueGenre_venue_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_ArtistGenre_artist_id', 'artist_id'),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+class Versioned:
+    """Timestamps and a version counter backing the HTTP validators.
 
-db = SQLAlchemy()
+    The version doubles as SQLAlchemy's ``version_id_col``, so every ORM UPDATE
+    bumps it and refuses to overwrite a row that changed underneath it.
+    """
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False)
 
+    @declared_attr
+    def __mapper_args__(cls):
+        return {'version_id_col': cls.version}
 
-class Venue(db.Model):
+
+def genres_by_name(session, names):
+    """Returns Genre rows for the given names, creating the missing ones."""
+    existing = {genre.name: genre for genre in session.query(Genre).filter(Genre.name.in_(names))}
+    return [existing.get(name) or Genre(name=name) for name in names]
+
+
+def genre_ids(session, names):
+    """Maps the given genre names to their ids, inserting the missing ones."""
+    existing = dict(session.execute(select(Genre.name, Genre.id).where(Genre.name.in_(names))).all())
+    missing = [name for name in names if name not in existing]
+    if missing:
+        session.execute(insert(Genre), [{'name': name} for name in missing])
+        existing.update(session.execute(select(Genre.name, Genre.id).where(Genre.name.in_(missing))).all())
+    return existing
+
+
+class Venue(Versioned, db.Model):
     __tablename__ = 'Venue'
+    # The Postgres-only trigram indexes on name live in migration 04abf9f3ae3c.
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name', 'id'),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+        db.Index('ix_Venue_name_lower', db.func.lower(db.text('name')), 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(500), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=True)
     seeking_description = db.Column(db.String(500), nullable=True)
-    shows = db.relationship("Show", backref="venues", lazy=True, cascade="all,delete-orphan")
+    # Maintained by counters.py as shows are added, removed and rolled over.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    # Set while archived: hidden from listings, search and lookups, but kept.
+    archived_at = db.Column(db.DateTime, nullable=True)
+    # The ON DELETE CASCADE foreign keys remove shows and genre links, so
+    # deleting never loads them.
+    genres = db.relationship("Genre", secondary=venue_genres, lazy=True, order_by="Genre.name", passive_deletes=True)
+    shows = db.relationship("Show", backref="venues", lazy=True, cascade="all,delete-orphan", passive_deletes=True)
 
 
-class Artist(db.Model):
+class Artist(Versioned, db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+        db.Index('ix_Artist_name_lower', db.func.lower(db.text('name')), 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(500), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=True)
     seeking_venue = db.Column(db.Boolean, nullable=True)
     seeking_description = db.Column(db.String(500), nullable=True)
-    shows = db.relationship("Show", backref="artists", lazy=True, cascade="all,delete-orphan")
+    # Maintained by counters.py as shows are added, removed and rolled over.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    # Set while archived: hidden from listings, search and lookups, but kept.
+    archived_at = db.Column(db.DateTime, nullable=True)
+    # The ON DELETE CASCADE foreign keys remove shows and genre links, so
+    # deleting never loads them.
+    genres = db.relationship("Genre", secondary=artist_genres, lazy=True, order_by="Genre.name", passive_deletes=True)
+    shows = db.relationship("Show", backref="artists", lazy=True, cascade="all,delete-orphan", passive_deletes=True)
 
 
-class Show(db.Model):
+def _started(context):
+    return context.get_current_parameters()['date'] < datetime.utcnow()
+
+
+class Show(Versioned, db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_date', 'venue_id', 'date'),
+        db.Index('ix_Show_artist_id_date', 'artist_id', 'date'),
+        db.Index('ix_Show_date_id', 'date', 'id'),
+        db.Index('ix_Show_updated_at', 'updated_at'),
+        db.Index('ix_Show_is_past_date', 'is_past', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(), nullable=False)
     date = db.Column(db.DateTime(), nullable=False)
+    # Set once the show has started; flipped for existing shows by `flask rollover-shows`.
+    is_past = db.Column(db.Boolean, nullable=False, default=_started)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete="CASCADE"), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete="CASCADE"), nullable=False)
+
+
+# Association table and owner column for each model that carries genres.
+GENRE_LINKS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+
+# ----------------------------------------------------------------------------#
+# Table versions
+# ----------------------------------------------------------------------------#
+
+# Tables whose writes move the version behind the /venues, /artists and /shows
+# validators; reading one row beats aggregating the whole table per request.
+VERSIONED_TABLES = ('Venue', 'Artist', 'Show')
+
+
+class TableVersion(db.Model):
+    __tablename__ = 'TableVersion'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _seed_table_versions(table, connection, **kwargs):
+    connection.execute(insert(table), [{'name': name, 'version': 0, 'updated_at': datetime.utcnow()}
+                                       for name in VERSIONED_TABLES])
+
+
+def _written(db_session):
+    return db_session.info.setdefault('written_tables', set())
+
+
+def mark_written(db_session, *table_names):
+    """Records writes the session cannot see, such as a COPY on the raw DBAPI
+    connection, so the commit still moves their TableVersion rows on."""
+    _written(db_session).update(table_names)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_flush(db_session, flush_context):
+    for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+        _written(db_session).add(instance.__table__.name)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _track_execute(orm_execute_state):
+    # Core INSERT/UPDATE/DELETE statements bypass the flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _written(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _bump_table_versions(db_session):
+    # Pending objects are flushed after this hook, so flush them first.
+    db_session.flush()
+    tables = _written(db_session).intersection(VERSIONED_TABLES)
+    db_session.info.pop('written_tables', None)
+    if tables:
+        db_session.execute(update(TableVersion)
+                           .where(TableVersion.name.in_(sorted(tables)))
+                           .values(version=TableVersion.version + 1, updated_at=datetime.utcnow()))
+        db_session.info.pop('written_tables', None)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(db_session):
+    db_session.info.pop('written_tables', None)
@@ -0,0 +1,18 @@
+from functools import wraps
+
+from flask import abort, current_app, request
+
+
+def operators_only(view):
+    """Hides an operational endpoint (stats, metrics) from clients outside
+    OPS_ALLOWED_ADDRS; an empty list leaves it open to everyone."""
+
+    @wraps(view)
+    def wrapper(**kwargs):
+        allowed = current_app.config['OPS_ALLOWED_ADDRS']
+        if allowed and request.remote_addr not in allowed:
+            # 404 rather than 403, so the endpoint does not announce itself.
+            abort(404)
+        return view(**kwargs)
+
+    return wrapper
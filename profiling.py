@@ -0,0 +1,128 @@
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+# Bound-parameter lists such as "IN (?, ?, ?)" or "IN (%(p_1)s, %(p_2)s)".
+_PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,?)+\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def statement_shape(statement):
+    """Reduces a statement to its shape, so that the same query run with other
+    parameters or IN-list lengths compares equal."""
+    shape = _PARAMETER_LIST.sub('(?)', statement)
+    return ' '.join(_NUMBER.sub('N', shape).split())
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.render_time = 0.0
+        self.render_starts = []
+
+    def add_query(self, statement, duration):
+        self.queries.append((statement, duration))
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def slowest(self):
+        return max(self.queries, key=lambda query: query[1], default=(None, 0.0))
+
+    def repeated_shapes(self, threshold):
+        """Statement shapes run at least ``threshold`` times: likely N+1 loops."""
+        shapes = Counter(statement_shape(statement) for statement, _ in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+def _profile():
+    if has_request_context():
+        return g.get('profile')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_starts', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_starts'].pop()
+    profile = _profile()
+    if profile is not None:
+        profile.add_query(statement, duration)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get('query_starts') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    profile = _profile()
+    if profile is not None:
+        profile.render_starts.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    profile = _profile()
+    if profile is not None and profile.render_starts:
+        started = profile.render_starts.pop()
+        # Only the outermost render counts, or nested renders would add up twice.
+        if not profile.render_starts:
+            profile.render_time += time.perf_counter() - started
+
+
+def server_timing(profile, total, rendered=True):
+    entries = ['sql;dur=%.1f;desc="%d queries"' % (profile.sql_time * 1000, len(profile.queries))]
+    if rendered:
+        entries.append('render;dur=%.1f' % (profile.render_time * 1000))
+    entries.append('total;dur=%.1f' % (total * 1000))
+    return ', '.join(entries)
+
+
+def register(app, db):
+    # metrics.py reads the profile too, so it is collected for either.
+    if not (app.config['PROFILE_REQUESTS'] or app.config['METRICS_ENABLED']):
+        return
+    threshold = app.config['PROFILE_N_PLUS_ONE_THRESHOLD']
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_profile():
+        g.profile = RequestProfile()
+
+    @app.after_request
+    def report_profile(response):
+        profile = g.get('profile')
+        if profile is None or not app.config['PROFILE_REQUESTS']:
+            return response
+        total = time.perf_counter() - profile.started
+        # A streamed page renders after the headers are sent; /metrics records
+        # its render time once the response closes.
+        response.headers.add('Server-Timing', server_timing(profile, total, rendered=not response.is_streamed))
+        repeated = profile.repeated_shapes(threshold)
+        for shape, count in repeated:
+            app.logger.warning('Possible N+1: %d x %s', count, shape)
+        if app.config['PROFILE_PANEL'] and response.mimetype == 'text/html' \
+                and not response.is_streamed and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                panel = app.jinja_env.get_template('debug/profile.html').render(
+                    profile=profile, total=total, repeated=repeated, threshold=threshold)
+                index = body.rindex('</body>')
+                response.set_data(body[:index] + panel + body[index:])
+        return response
@@ -0,0 +1,380 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import and_, case, func, or_, select, tuple_
+
+from models import Venue, Artist, Show, Genre, TableVersion, GENRE_LINKS
+
+AREAS_PER_PAGE = 20
+PAST_SHOWS_LIMIT = 12
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 50
+SHOW_MODES = ('all', 'upcoming', 'past')
+LOOKUP_LIMIT = 10
+
+AreaPage = namedtuple('AreaPage', ['areas', 'state', 'genre', 'page', 'has_prev', 'has_next'])
+ShowPage = namedtuple('ShowPage', ['shows', 'mode', 'next_cursor'])
+ArtistPage = namedtuple('ArtistPage', ['artists', 'genre', 'start', 'next_cursor'])
+
+
+# ----------------------------------------------------------------------------#
+# Cursors
+# ----------------------------------------------------------------------------#
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *converters):
+    # Returns None for anything that does not look like a cursor we produced, so a
+    # tampered or stale link degrades to the first page instead of a 500.
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(converters):
+            return None
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except (ValueError, TypeError):
+        return None
+
+
+# ----------------------------------------------------------------------------#
+# Genres
+# ----------------------------------------------------------------------------#
+
+def genre_filter(model, genre):
+    # Resolved through the (genre_id, owner_id) primary key of the association table.
+    link, owner_id = GENRE_LINKS[model]
+    return model.id.in_(select(owner_id)
+                        .join(Genre, Genre.id == link.c.genre_id)
+                        .where(Genre.name == genre))
+
+
+def genre_names(session, model, ids):
+    """Maps each of the given venue or artist ids to its genre names."""
+    link, owner_id = GENRE_LINKS[model]
+    genres = {}
+    rows = session.execute(select(owner_id, Genre.name)
+                           .join(Genre, Genre.id == link.c.genre_id)
+                           .where(owner_id.in_(ids))
+                           .order_by(owner_id, Genre.name))
+    for entity_id, name in rows:
+        genres.setdefault(entity_id, []).append(name)
+    return genres
+
+
+# ----------------------------------------------------------------------------#
+# Venue areas
+# ----------------------------------------------------------------------------#
+
+def area_page_query(session, state=None, page=1, per_page=AREAS_PER_PAGE, genre=None):
+    # One extra area is fetched so the caller can tell whether a next page exists
+    # without issuing a separate count query.
+    areas = session.query(Venue.state, Venue.city).filter(Venue.archived_at.is_(None)).distinct()
+    if state:
+        areas = areas.filter(Venue.state == state)
+    if genre:
+        areas = areas.filter(genre_filter(Venue, genre))
+    areas = areas.order_by(Venue.state, Venue.city) \
+        .limit(per_page + 1) \
+        .offset((page - 1) * per_page) \
+        .subquery()
+    rows = session.query(Venue.state, Venue.city, Venue.id, Venue.name, Venue.upcoming_shows_count) \
+        .join(areas, and_(Venue.state == areas.c.state, Venue.city == areas.c.city)) \
+        .filter(Venue.archived_at.is_(None))
+    if genre:
+        rows = rows.filter(genre_filter(Venue, genre))
+    return rows.order_by(Venue.state, Venue.city, Venue.name, Venue.id)
+
+
+def load_area_page(session, state=None, page=1, per_page=AREAS_PER_PAGE, genre=None):
+    page = max(page, 1)
+    areas = []
+    rows = area_page_query(session, state, page, per_page, genre)
+    for (area_state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        areas.append({
+            "city": city,
+            "state": area_state,
+            "venues": [{"id": v.id, "name": v.name, "num_upcoming_shows": v.upcoming_shows_count} for v in venues]
+        })
+    has_next = len(areas) > per_page
+    return AreaPage(areas=areas[:per_page], state=state, genre=genre, page=page,
+                    has_prev=page > 1, has_next=has_next)
+
+
+# ----------------------------------------------------------------------------#
+# Artists
+# ----------------------------------------------------------------------------#
+
+def artist_list_query(genre=None, after=None, start=None):
+    # Keyset pagination on (lower(name), id), which ix_Artist_name_lower serves
+    # in order; ``start`` jumps to the first name at or after it, ignoring case,
+    # like the initials of the jump index.
+    key = func.lower(Artist.name)
+    stmt = select(Artist.id, Artist.name, key.label('sort_key'),
+                  Artist.upcoming_shows_count.label('num_upcoming_shows')) \
+        .where(Artist.archived_at.is_(None))
+    if genre:
+        stmt = stmt.where(genre_filter(Artist, genre))
+    if after is not None:
+        stmt = stmt.where(tuple_(key, Artist.id) > after)
+    elif start:
+        stmt = stmt.where(key >= start.lower())
+    return stmt.order_by(key, Artist.id)
+
+
+def load_artist_page(session, genre=None, cursor=None, start=None, per_page=ARTISTS_PER_PAGE):
+    after = decode_cursor(cursor, str, int)
+    rows = session.execute(artist_list_query(genre, after, start).limit(per_page + 1)).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].id)
+    return ArtistPage(artists=rows, genre=genre, start=None if after else start, next_cursor=next_cursor)
+
+
+def artist_initials_query(genre=None):
+    initial = func.substr(func.lower(Artist.name), 1, 1)
+    stmt = select(initial, func.count()).where(Artist.archived_at.is_(None))
+    if genre:
+        stmt = stmt.where(genre_filter(Artist, genre))
+    return stmt.group_by(initial)
+
+
+def load_artist_index(session, genre=None):
+    """The A-Z jump index: maps each letter, and '#' for names that do not start
+    with one, to the (lowercase) start value and the number of artists under it."""
+    index = {}
+    for initial, count in session.execute(artist_initials_query(genre)):
+        letter = initial.upper() if 'A' <= initial.upper() <= 'Z' else '#'
+        start, total = index.get(letter, (initial, 0))
+        index[letter] = (min(start, initial), total + count)
+    return index
+
+
+# ----------------------------------------------------------------------------#
+# Venue and artist detail
+# ----------------------------------------------------------------------------#
+
+# For each detail page: the Show column pointing at the entity, the counterpart
+# model shown on every show tile and the Show column pointing at it.
+_DETAIL_JOINS = {
+    Venue: (Show.venue_id, Artist, Show.artist_id, 'artist'),
+    Artist: (Show.artist_id, Venue, Show.venue_id, 'venue'),
+}
+
+
+def detail_query(model, entity_id, now, past_before=None):
+    owner_fk, counterpart, counterpart_fk, _ = _DETAIL_JOINS[model]
+    show_filter = owner_fk == model.id
+    if past_before is not None:
+        show_filter = and_(show_filter, or_(Show.date >= now, tuple_(Show.date, Show.id) < past_before))
+    # Newest first: every upcoming show comes before the past ones, so the past
+    # shows can be capped by simply not reading any further rows.
+    return select(model,
+                  Show.id.label('show_id'),
+                  Show.date,
+                  counterpart.id.label('counterpart_id'),
+                  counterpart.name.label('counterpart_name'),
+                  counterpart.image_link.label('counterpart_image_link')) \
+        .outerjoin(Show, show_filter) \
+        .outerjoin(counterpart, counterpart.id == counterpart_fk) \
+        .where(model.id == entity_id, model.archived_at.is_(None)) \
+        .order_by(Show.date.desc(), Show.id.desc())
+
+
+def load_detail(session, model, entity_id, past_cursor=None, past_limit=PAST_SHOWS_LIMIT, now=None):
+    """Loads an entity with its shows split into upcoming and (capped) past ones.
+
+    Returns ``None`` when the entity does not exist or is archived.
+    """
+    now = now or datetime.utcnow()
+    past_before = decode_cursor(past_cursor, datetime.fromisoformat, int)
+    prefix = _DETAIL_JOINS[model][3]
+    entity = None
+    upcoming_shows = []
+    past_shows = []
+    more_past = None
+    result = session.execute(detail_query(model, entity_id, now, past_before),
+                             execution_options={'yield_per': 100})
+    try:
+        for row in result:
+            entity = row[0]
+            if row.show_id is None:
+                break
+            show = {
+                prefix + "_id": row.counterpart_id,
+                prefix + "_name": row.counterpart_name,
+                prefix + "_image_link": row.counterpart_image_link,
+                "start_time": row.date
+            }
+            if row.date >= now:
+                upcoming_shows.append(show)
+            elif len(past_shows) < past_limit:
+                past_shows.append(show)
+                last_past = (row.date, row.show_id)
+            else:
+                more_past = encode_cursor(*last_past)
+                break
+    finally:
+        result.close()
+    if entity is None:
+        return None
+    upcoming_shows.reverse()
+    return {
+        "entity": entity,
+        "upcoming_shows": upcoming_shows,
+        "past_shows": past_shows,
+        "upcoming_shows_count": entity.upcoming_shows_count,
+        "past_shows_count": entity.past_shows_count,
+        "more_past_cursor": more_past,
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Shows feed
+# ----------------------------------------------------------------------------#
+
+def show_feed_query(mode='all', after=None, now=None):
+    # Keyset pagination on (date, id): each page starts right after the last row
+    # of the previous one, so deep pages cost the same as the first.
+    now = now or datetime.utcnow()
+    key = tuple_(Show.date, Show.id)
+    stmt = select(Show.id,
+                  Show.date,
+                  Show.venue_id,
+                  Venue.name.label('venue_name'),
+                  Show.artist_id,
+                  Artist.name.label('artist_name'),
+                  Artist.image_link.label('artist_image_link')) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .where(Venue.archived_at.is_(None), Artist.archived_at.is_(None))
+    if mode == 'past':
+        stmt = stmt.where(Show.date < now)
+        if after is not None:
+            stmt = stmt.where(key < after)
+        return stmt.order_by(Show.date.desc(), Show.id.desc())
+    if mode == 'upcoming':
+        stmt = stmt.where(Show.date >= now)
+    if after is not None:
+        stmt = stmt.where(key > after)
+    return stmt.order_by(Show.date, Show.id)
+
+
+def load_show_page(session, mode='all', cursor=None, per_page=SHOWS_PER_PAGE, now=None):
+    if mode not in SHOW_MODES:
+        mode = 'all'
+    after = decode_cursor(cursor, datetime.fromisoformat, int)
+    rows = session.execute(show_feed_query(mode, after, now).limit(per_page + 1)).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    shows = [{
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.date
+    } for row in rows]
+    return ShowPage(shows=shows, mode=mode, next_cursor=next_cursor)
+
+
+def counterpart_ids(session, model, *entity_ids):
+    """Ids of the artists (for venues) or venues (for artists) they have shows with."""
+    owner_fk, _, counterpart_fk, _ = _DETAIL_JOINS[model]
+    return session.execute(select(counterpart_fk).where(owner_fk.in_(entity_ids)).distinct()).scalars().all()
+
+
+# ----------------------------------------------------------------------------#
+# Name lookups
+# ----------------------------------------------------------------------------#
+
+def _prefix_end(prefix):
+    # The smallest string above every string starting with prefix.
+    for index in range(len(prefix) - 1, -1, -1):
+        if ord(prefix[index]) < 0x10FFFF:
+            return prefix[:index] + chr(ord(prefix[index]) + 1)
+    return None
+
+
+def lookup_query(model, prefix, limit=LOOKUP_LIMIT):
+    """Names starting with ``prefix``, ignoring case, in name order.
+
+    The range on lower(name) keeps it on the ix_*_name_lower index on every
+    database; the LIKE only re-checks the rows inside that range.
+    """
+    prefix = prefix.lower()
+    key = func.lower(model.name)
+    stmt = select(model.id, model.name, model.city, model.state) \
+        .where(key >= prefix, key.startswith(prefix, autoescape=True), model.archived_at.is_(None))
+    end = _prefix_end(prefix)
+    if end is not None:
+        stmt = stmt.where(key < end)
+    return stmt.order_by(key, model.id).limit(limit)
+
+
+def lookup(session, model, prefix, limit=LOOKUP_LIMIT):
+    if not prefix:
+        return []
+    return [dict(row._mapping) for row in session.execute(lookup_query(model, prefix, limit))]
+
+
+# ----------------------------------------------------------------------------#
+# Validators
+# ----------------------------------------------------------------------------#
+
+# Each returns (parts, last_modified): parts change whenever the rendered page
+# would, and are computed from indexed columns without loading the page data.
+
+def detail_version_query(model, entity_id, now):
+    owner_fk, counterpart, counterpart_fk, _ = _DETAIL_JOINS[model]
+    return select(model.version,
+                  model.updated_at,
+                  model.upcoming_shows_count,
+                  model.past_shows_count,
+                  func.count(Show.id),
+                  func.sum(case((Show.date >= now, 1), else_=0)),
+                  func.max(Show.updated_at),
+                  func.max(counterpart.updated_at)) \
+        .outerjoin(Show, owner_fk == model.id) \
+        .outerjoin(counterpart, counterpart.id == counterpart_fk) \
+        .where(model.id == entity_id, model.archived_at.is_(None)) \
+        .group_by(model.id, model.version, model.updated_at, model.upcoming_shows_count, model.past_shows_count)
+
+
+def detail_version(session, model, entity_id, now=None):
+    row = session.execute(detail_version_query(model, entity_id, now or datetime.utcnow())).first()
+    if row is None:
+        return None
+    return tuple(row), max(value for value in (row[1], row[6], row[7]) if value is not None)
+
+
+def table_version_query(*models):
+    return select(TableVersion.name, TableVersion.version, TableVersion.updated_at) \
+        .where(TableVersion.name.in_([model.__tablename__ for model in models]))
+
+
+def last_started_query(now):
+    # The latest started show moves whenever one crosses into the past.
+    return select(func.max(Show.date)).where(Show.date < now)
+
+
+def list_version(session, *models, now=None):
+    """Reads the TableVersion row of each model, which every committed write
+    to that table moves on (see models.py)."""
+    versions = {row.name: row for row in session.execute(table_version_query(*models))}
+    if len(versions) < len(models):
+        return None
+    parts = [versions[model.__tablename__].version for model in models]
+    if Show in models:
+        parts.append(session.execute(last_started_query(now or datetime.utcnow())).scalar())
+    return tuple(parts), max(row.updated_at for row in versions.values())
\ No newline at end of file
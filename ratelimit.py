@@ -0,0 +1,156 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+
+# ----------------------------------------------------------------------------#
+# Buckets
+# ----------------------------------------------------------------------------#
+
+def _refill(tokens, updated, rate, burst, now):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBuckets:
+    """Token buckets in a per-process dictionary."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Takes a token from ``key``'s bucket; returns 0 when one was there,
+        else the seconds until there will be one."""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (burst, now, now))
+            tokens = _refill(tokens, updated, rate, burst, now)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self.buckets) > self.max_keys:
+                # A bucket that has filled up again is the same as no bucket.
+                self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        return wait
+
+
+class SQLiteBuckets:
+    """Token buckets in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        connection = self._connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS buckets ('
+                           'key TEXT PRIMARY KEY, tokens REAL, updated REAL, full_at REAL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_buckets_full_at ON buckets (full_at)')
+
+    def _connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Autocommit, so the transaction below can be BEGIN IMMEDIATE.
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+        return connection
+
+    def take(self, key, rate, burst):
+        # Wall-clock time, since the buckets outlive any one process.
+        now = time.time()
+        connection = self._connect()
+        # Takes the write lock up front, so two workers cannot both spend the last token.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(*row, rate, burst, now) if row else burst
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                               (key, tokens, now, now + (burst - tokens) / rate))
+            connection.execute('DELETE FROM buckets WHERE full_at < ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+# ----------------------------------------------------------------------------#
+# Limiter
+# ----------------------------------------------------------------------------#
+
+class RateLimiter:
+    """Admission control for expensive views: a token bucket per client and
+    route, then a cap on how many run at once in this process."""
+
+    def __init__(self, app=None):
+        self.backend = MemoryBuckets()
+        self.enabled = True
+        self.slots = {}
+        self.slots_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        backend = app.config.get('RATELIMIT_STORAGE', 'memory')
+        if backend == 'sqlite':
+            path = app.config.get('RATELIMIT_PATH') or os.path.join(app.instance_path, 'ratelimit.sqlite')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBuckets(path)
+        elif backend == 'memory':
+            self.backend = MemoryBuckets()
+        else:
+            raise ValueError('Unknown RATELIMIT_STORAGE %r' % backend)
+        self.slots = {}
+        app.extensions['ratelimit'] = self
+
+    def _slots(self, name, size):
+        with self.slots_lock:
+            if name not in self.slots:
+                self.slots[name] = threading.BoundedSemaphore(size)
+            return self.slots[name]
+
+    def check_rate(self, name, config):
+        """Raises 429 once the client has used up its burst for this route."""
+        key = '%s:%s:%s' % (name, request.endpoint, request.remote_addr)
+        try:
+            wait = self.backend.take(key, config['RATELIMIT_%s_RATE' % name.upper()],
+                                     config['RATELIMIT_%s_BURST' % name.upper()])
+        except sqlite3.OperationalError:
+            # A busy or broken store must not take the site down with it.
+            current_app.logger.exception('Rate limit store unavailable; letting %s through', key)
+            return
+        if wait:
+            raise TooManyRequests(retry_after=math.ceil(wait))
+
+    def limit(self, name):
+        """Applies the RATELIMIT_<NAME>_RATE/_BURST bucket and the
+        <NAME>_MAX_CONCURRENT cap from the config to a view."""
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                config = current_app.config
+                if not self.enabled:
+                    return view(**kwargs)
+                self.check_rate(name, config)
+                slots = self._slots(name, config['%s_MAX_CONCURRENT' % name.upper()])
+                if not slots.acquire(timeout=config['%s_QUEUE_TIMEOUT' % name.upper()]):
+                    raise ServiceUnavailable(retry_after=1)
+                try:
+                    return view(**kwargs)
+                finally:
+                    slots.release()
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,81 @@
+import random
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_PREFIX = 'replica_'
+STICKY_KEY = '_primary_until'
+
+
+def read_only(view):
+    """Marks a view whose SELECTs may be served by a replica."""
+    view.read_only = True
+    return view
+
+
+def recently_invalidated(view, view_args):
+    """Whether the page behind ``view`` was dropped from the shared cache within
+    REPLICA_STICKY_SECONDS. Such a page is rebuilt, and its ETag computed, from
+    the primary, or a lagging replica would put the old page back for everyone.
+    """
+    key = getattr(view, 'cache_key', None)
+    cache = current_app.extensions.get('cache')
+    return key is not None and cache is not None and cache.recently_invalidated(key(**view_args))
+
+
+def replica_binds(uris):
+    return {'%s%d' % (REPLICA_PREFIX, index): uri for index, uri in enumerate(uris)}
+
+
+class RoutingSession(Session):
+    """Sends the SELECTs of read-only views to the replica picked for the
+    request; everything else, and every read after a write, goes to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self._flushing and has_request_context():
+            replica = g.get('db_replica')
+            if replica is not None and not g.get('db_wrote'):
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(db_session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _on_execute(orm_execute_state):
+    # Core INSERT/UPDATE/DELETE statements bypass the flush.
+    if not orm_execute_state.is_select:
+        _mark_write()
+
+
+def register(app):
+    """Adds a bind per configured replica; call it before db.init_app(app)."""
+    binds = replica_binds(app.config['SQLALCHEMY_REPLICA_URIS'])
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **binds)
+    replicas = sorted(binds)
+
+    @app.before_request
+    def route_reads():
+        view = app.view_functions.get(request.endpoint)
+        # Someone who just wrote keeps reading from the primary for a while, so
+        # replication lag never hides their own changes from them.
+        if replicas and getattr(view, 'read_only', False) and session.get(STICKY_KEY, 0) < time.time() \
+                and not recently_invalidated(view, request.view_args or {}):
+            g.db_replica = random.choice(replicas)
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('db_wrote'):
+            session[STICKY_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        return response
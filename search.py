@@ -0,0 +1,220 @@
+import bisect
+import re
+import threading
+from collections import namedtuple
+
+from sqlalchemy import func, literal_column, select, union
+
+from models import Venue, Artist, Genre, TableVersion, GENRE_LINKS
+
+SEARCH_LIMIT = 20
+
+# Heavier fields rank higher; the Postgres weights A-D follow the same order.
+# Genres live in association tables and are searched alongside the columns.
+FIELD_WEIGHTS = (('name', 'A', 8), ('city', 'B', 4), ('genres', 'C', 2), ('state', 'D', 1))
+COLUMN_FIELDS = tuple(field for field in FIELD_WEIGHTS if field[0] != 'genres')
+
+SearchResult = namedtuple('SearchResult', ['count', 'data'])
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN.findall(text or '')]
+
+
+# ----------------------------------------------------------------------------#
+# Postgres: weighted tsvector backed by the GIN index from migration ac571811423b
+# ----------------------------------------------------------------------------#
+
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def search_document(model):
+    # Must stay identical to the indexed expression in the migration, otherwise
+    # the planner will not use the index.
+    document = None
+    for field, weight, _ in COLUMN_FIELDS:
+        vector = func.setweight(
+            func.to_tsvector(SEARCH_CONFIG, func.coalesce(getattr(model, field), literal_column("''"))),
+            literal_column("'%s'" % weight))
+        document = vector if document is None else document.op('||')(vector)
+    return document
+
+
+def genre_document(model):
+    link, owner_id = GENRE_LINKS[model]
+    names = select(func.string_agg(Genre.name, literal_column("' '"))) \
+        .select_from(link.join(Genre, Genre.id == link.c.genre_id)) \
+        .where(owner_id == model.id) \
+        .scalar_subquery()
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(names, literal_column("''"))),
+                          literal_column("'C'"))
+
+
+def search_query(model, term):
+    # Every token must match as a word prefix, so partially typed words still hit.
+    tokens = tokenize(term)
+    stmt = select(model.id, model.name, model.upcoming_shows_count, func.count().over().label('total')) \
+        .where(model.archived_at.is_(None))
+    if not tokens:
+        return stmt.order_by(model.name, model.id)
+    any_token = func.to_tsquery(SEARCH_CONFIG, ' | '.join(token + ':*' for token in tokens))
+    all_tokens = func.to_tsquery(SEARCH_CONFIG, ' & '.join(token + ':*' for token in tokens))
+    link, owner_id = GENRE_LINKS[model]
+    # Candidates come from the column index and the (small) genre table; only
+    # those are checked against the full document including genres.
+    candidates = union(
+        select(model.id).where(search_document(model).op('@@')(any_token)),
+        select(owner_id).join(Genre, Genre.id == link.c.genre_id)
+            .where(func.to_tsvector(SEARCH_CONFIG, Genre.name).op('@@')(any_token)))
+    document = search_document(model).op('||')(genre_document(model))
+    return stmt.where(model.id.in_(candidates), document.op('@@')(all_tokens)) \
+        .order_by(func.ts_rank(document, all_tokens).desc(), model.name, model.id)
+
+
+def _search_postgres(session, model, term, limit, offset):
+    rows = session.execute(search_query(model, term).limit(limit).offset(offset)).all()
+    if not rows and offset:
+        # Past the last page the window count is gone with the rows.
+        total = session.execute(search_query(model, term).with_only_columns(func.count())
+                                .order_by(None)).scalar()
+    else:
+        total = rows[0].total if rows else 0
+    return SearchResult(count=total, data=[{"id": row.id, "name": row.name,
+                                            "num_upcoming_shows": row.upcoming_shows_count} for row in rows])
+
+
+# ----------------------------------------------------------------------------#
+# Everything else: in-process inverted and prefix index
+# ----------------------------------------------------------------------------#
+
+class MemoryIndex:
+    """Inverted index over one model, built from a single scan on first use.
+
+    Every committed write to the model moves its TableVersion row, including
+    the ones this worker never sees (other workers, `flask import`); the next
+    search that finds the index at an older version rebuilds it.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.names = {}
+        self.doc_tokens = {}
+        self.postings = {}
+        self.tokens = []
+        self.lock = threading.RLock()
+        self.built = False
+        self.version = None
+
+    def build(self, session, version=None):
+        link, owner_id = GENRE_LINKS[self.model]
+        with self.lock:
+            if self.built and self.version == version:
+                return
+            self.names, self.doc_tokens, self.postings, self.tokens = {}, {}, {}, []
+            genres = {}
+            for doc_id, name in session.execute(select(owner_id, Genre.name)
+                                                .join(Genre, Genre.id == link.c.genre_id)):
+                genres.setdefault(doc_id, []).append(name)
+            columns = [getattr(self.model, field) for field, _, _ in COLUMN_FIELDS]
+            for row in session.execute(select(self.model.id, *columns).where(self.model.archived_at.is_(None))):
+                document = dict(zip((field for field, _, _ in COLUMN_FIELDS), row[1:]))
+                document['genres'] = ' '.join(genres.get(row[0], ()))
+                self._add(row[0], document)
+            self.version = version
+            self.built = True
+
+    def _add(self, doc_id, document):
+        self.names[doc_id] = document['name']
+        doc_tokens = self.doc_tokens[doc_id] = set()
+        for field, _, weight in FIELD_WEIGHTS:
+            for token in tokenize(document[field]):
+                doc_tokens.add(token)
+                postings = self.postings.get(token)
+                if postings is None:
+                    postings = self.postings[token] = {}
+                    bisect.insort(self.tokens, token)
+                postings[doc_id] = postings.get(doc_id, 0) + weight
+
+    def _remove(self, doc_id):
+        if self.names.pop(doc_id, None) is None:
+            return
+        for token in self.doc_tokens.pop(doc_id):
+            postings = self.postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def update(self, entity):
+        with self.lock:
+            if self.built and entity.archived_at is not None:
+                self._remove(entity.id)
+            elif self.built:
+                document = {field: getattr(entity, field) for field, _, _ in COLUMN_FIELDS}
+                document['genres'] = ' '.join(genre.name for genre in entity.genres)
+                self._remove(entity.id)
+                self._add(entity.id, document)
+
+    def remove(self, doc_id):
+        with self.lock:
+            if self.built:
+                self._remove(doc_id)
+
+    def _prefix_scores(self, token):
+        # Exact token matches score double over words that merely start with it.
+        scores = {}
+        # Indexing in place: slicing would copy the rest of the vocabulary.
+        for position in range(bisect.bisect_left(self.tokens, token), len(self.tokens)):
+            candidate = self.tokens[position]
+            if not candidate.startswith(token):
+                break
+            boost = 2 if candidate == token else 1
+            for doc_id, weight in self.postings[candidate].items():
+                scores[doc_id] = max(scores.get(doc_id, 0), weight * boost)
+        return scores
+
+    def search(self, term, limit, offset):
+        tokens = tokenize(term)
+        with self.lock:
+            if not tokens:
+                scores = dict.fromkeys(self.names, 0)
+            else:
+                scores = self._prefix_scores(tokens[0])
+                for token in tokens[1:]:
+                    matches = self._prefix_scores(token)
+                    scores = {doc_id: score + matches[doc_id]
+                              for doc_id, score in scores.items() if doc_id in matches}
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self.names[item[0]], item[0]))
+            data = [{"id": doc_id, "name": self.names[doc_id]} for doc_id, _ in ranked[offset:offset + limit]]
+        return SearchResult(count=len(ranked), data=data)
+
+
+class SearchEngine:
+    def __init__(self):
+        self.indexes = {Venue: MemoryIndex(Venue), Artist: MemoryIndex(Artist)}
+
+    def search(self, session, model, term, limit=SEARCH_LIMIT, offset=0):
+        if session.get_bind().dialect.name == 'postgresql':
+            return _search_postgres(session, model, term, limit, offset)
+        index = self.indexes[model]
+        version = session.execute(select(TableVersion.version)
+                                  .where(TableVersion.name == model.__tablename__)).scalar()
+        if not index.built or index.version != version:
+            index.build(session, version)
+        result = index.search(term, limit, offset)
+        # Counters change too often to keep in the index; one primary key
+        # lookup for the page is enough.
+        counts = dict(session.execute(select(model.id, model.upcoming_shows_count)
+                                      .where(model.id.in_([item["id"] for item in result.data]))).all())
+        for item in result.data:
+            item["num_upcoming_shows"] = counts.get(item["id"], 0)
+        return result
+
+    def update(self, entity):
+        # Only the in-process index needs maintaining; Postgres keeps its own.
+        self.indexes[type(entity)].update(entity)
+
+    def remove(self, model, entity_id):
+        self.indexes[model].remove(entity_id)
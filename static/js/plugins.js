@@ -18,3 +18,34 @@ window.log = function(){
 
 // place any jQuery/helper plugins in here, instead of separate, slower script files.
 
+
+// Name typeahead for id fields marked with data-lookup="<lookup url>". The id
+// input is hidden and filled from the chosen suggestion; without JS it stays
+// a plain id field.
+(function ($) {
+  $('[data-lookup]').each(function () {
+    var $id = $(this), url = $id.data('lookup'), ids = {}, timer;
+    var $list = $('<datalist>').attr('id', this.id + '-options');
+    var $name = $('<input type="text" class="form-control" autocomplete="off">')
+      .attr({list: this.id + '-options', placeholder: 'Start typing a name'});
+    $id.attr('type', 'hidden').after($name, $list);
+    $name.on('input', function () {
+      var text = $name.val();
+      $id.val(ids.hasOwnProperty(text) ? ids[text] : '');
+      if (ids.hasOwnProperty(text) || !$.trim(text)) return;
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        $.getJSON(url, {q: text}, function (body) {
+          if ($name.val() !== text) return;  // a newer request is on its way
+          ids = {};
+          $list.empty();
+          $.each(body.data, function (_, item) {
+            var label = item.name + ' (' + item.city + ', ' + item.state + ')';
+            ids[label] = item.id;
+            $list.append($('<option>').attr('value', label));
+          });
+        });
+      }, 150);
+    });
+  });
+})(jQuery);
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import counters
+import views
+from app import create_app
+from models import db, Venue, Artist, Show, genres_by_name
+from search import SearchEngine
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # A file rather than sqlite://, so every connection sees the same data.
+    app = create_app('testing',
+                     SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'fyyur.db'),
+                     LOG_FILE=str(tmp_path / 'app.log'),
+                     RATELIMIT_ENABLED=False)
+    # The search index lives on the blueprint module, shared by every app.
+    monkeypatch.setattr(views, 'search_engine', SearchEngine())
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_venue(app):
+    def make_venue(name='The Venue', genres=('Jazz',), **values):
+        with app.app_context():
+            venue = Venue(name=name, city=values.pop('city', 'San Francisco'), state=values.pop('state', 'CA'),
+                          address='1 Main St', phone='123-456-7890', image_link='http://example.com/v.png',
+                          facebook_link='http://facebook.com/venue', **values)
+            venue.genres = genres_by_name(db.session, list(genres))
+            db.session.add(venue)
+            db.session.commit()
+            return venue.id
+
+    return make_venue
+
+
+@pytest.fixture
+def make_artist(app):
+    def make_artist(name='The Artist', genres=('Jazz',), **values):
+        with app.app_context():
+            artist = Artist(name=name, city=values.pop('city', 'San Francisco'), state=values.pop('state', 'CA'),
+                            phone='123-456-7890', image_link='http://example.com/a.png',
+                            facebook_link='http://facebook.com/artist', **values)
+            artist.genres = genres_by_name(db.session, list(genres))
+            db.session.add(artist)
+            db.session.commit()
+            return artist.id
+
+    return make_artist
+
+
+@pytest.fixture
+def make_show(app):
+    def make_show(venue_id, artist_id, starts_in=timedelta(days=1), name='The Show'):
+        with app.app_context():
+            show = Show(name=name, venue_id=venue_id, artist_id=artist_id, date=datetime.utcnow() + starts_in)
+            db.session.add(show)
+            db.session.flush()
+            counters.count_shows(db.session, [(venue_id, artist_id, show.is_past)])
+            db.session.commit()
+            return show.id
+
+    return make_show
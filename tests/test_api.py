@@ -0,0 +1,34 @@
+import json
+
+
+def names(response):
+    return [item['name'] for item in response.get_json()['data']]
+
+
+def test_archived_rows_are_hidden_unless_asked_for(client, make_venue, make_artist, make_show):
+    open_id, closed_id = make_venue('Open Hall'), make_venue('Closed Hall')
+    artist_id = make_artist()
+    make_show(open_id, artist_id, name='Kept')
+    make_show(closed_id, artist_id, name='Hidden')
+    client.post('/venues/archive', data={'ids': closed_id})
+
+    assert names(client.get('/api/v1/venues')) == ['Open Hall']
+    assert names(client.get('/api/v1/venues?archived=1')) == ['Open Hall', 'Closed Hall']
+    assert names(client.get('/api/v1/shows')) == ['Kept']
+    assert names(client.get('/api/v1/shows?archived=1')) == ['Kept', 'Hidden']
+    assert client.get('/api/v1/venues/%d' % closed_id).status_code == 404
+    assert client.get('/api/v1/venues/%d?archived=1' % closed_id).status_code == 200
+
+    export = client.get('/api/v1/export/venues.ndjson').get_data(as_text=True)
+    assert [json.loads(line)['name'] for line in export.splitlines()] == ['Open Hall']
+
+
+def test_list_pages_with_the_cursor(client, make_venue):
+    for number in range(5):
+        make_venue('Venue %d' % number)
+    seen, url = [], '/api/v1/venues?limit=2'
+    while url:
+        body = client.get(url).get_json()
+        seen += [item['name'] for item in body['data']]
+        url = body['next_cursor'] and '/api/v1/venues?limit=2&cursor=' + body['next_cursor']
+    assert seen == ['Venue %d' % number for number in range(5)]
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from views import cache
+
+
+def test_list_answers_304_until_a_write(client, make_venue):
+    make_venue('First')
+    response = client.get('/venues')
+    etag = response.headers['ETag']
+
+    assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 304
+
+    make_venue('Second')
+    response = client.get('/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b'Second' in response.get_data()
+
+
+def test_cached_detail_page_is_stored_with_its_etag(client, make_venue):
+    venue_id = make_venue()
+    first = client.get('/venues/%d' % venue_id)
+    second = client.get('/venues/%d' % venue_id)
+
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.get_data() == first.get_data()
+    assert cache.stats()['hits'] >= 1
+
+
+def test_cached_detail_page_follows_the_validator(client, make_venue, make_artist, make_show):
+    # A show starting changes the ETag without any write; the cached page must
+    # not be served again under the new tag.
+    venue_id = make_venue()
+    make_show(venue_id, make_artist(), starts_in=timedelta(seconds=1))
+    before = client.get('/venues/%d' % venue_id)
+    time.sleep(1.2)
+    after = client.get('/venues/%d' % venue_id)
+
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert after.get_data() != before.get_data()
+    assert client.get('/venues/%d' % venue_id, headers={'If-None-Match': after.headers['ETag']}).status_code == 304
+
+
+def test_edit_invalidates_the_cached_detail_page(client, make_venue):
+    venue_id = make_venue('Before')
+    client.get('/venues/%d' % venue_id)
+    client.post('/venues/%d/edit' % venue_id, data={
+        'name': 'After', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+        'phone': '123-456-7890', 'image_link': 'http://example.com/v.png', 'genres': 'Jazz',
+        'facebook_link': 'http://facebook.com/venue', 'website': 'http://example.com', 'version': 1,
+    })
+    assert b'After' in client.get('/venues/%d' % venue_id).get_data()
+
+
+def test_new_show_invalidates_both_cached_pages(client, make_venue, make_artist):
+    venue_id, artist_id = make_venue(), make_artist()
+    client.get('/venues/%d' % venue_id)
+    client.get('/artists/%d' % artist_id)
+    client.post('/shows/create', data={'name': 'Opening Night', 'venue_id': venue_id, 'artist_id': artist_id,
+                                       'start_time': '2031-05-01 20:00:00'})
+    assert '1 Upcoming' in client.get('/venues/%d' % venue_id).get_data(as_text=True)
+    assert '1 Upcoming' in client.get('/artists/%d' % artist_id).get_data(as_text=True)
+
+
+def test_archived_pages_stop_being_served_from_the_cache(client, make_venue):
+    venue_id = make_venue()
+    assert client.get('/venues/%d' % venue_id).status_code == 200
+    client.post('/venues/archive', data={'ids': venue_id})
+    assert client.get('/venues/%d' % venue_id).status_code == 404
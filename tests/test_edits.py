@@ -0,0 +1,41 @@
+import pytest
+
+VENUE_FORM = {
+    'name': 'Edited', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'phone': '123-456-7890',
+    'image_link': 'http://example.com/v.png', 'genres': 'Jazz', 'facebook_link': 'http://facebook.com/venue',
+    'website': 'http://example.com',
+}
+
+
+def test_edit_with_the_current_version_saves(client, make_venue):
+    venue_id = make_venue()
+    response = client.post('/venues/%d/edit' % venue_id, data=dict(VENUE_FORM, version=1))
+    assert response.status_code == 302
+    assert b'Edited' in client.get('/venues/%d' % venue_id).get_data()
+
+
+def test_edit_with_a_stale_version_conflicts(client, make_venue):
+    venue_id = make_venue('Original')
+    assert client.post('/venues/%d/edit' % venue_id, data=dict(VENUE_FORM, version=1)).status_code == 302
+
+    response = client.post('/venues/%d/edit' % venue_id, data=dict(VENUE_FORM, name='Stale', version=1))
+    assert response.status_code == 409
+    assert b'changed by someone else' in response.get_data()
+    assert b'Stale' not in client.get('/venues/%d' % venue_id).get_data()
+
+
+def test_edit_without_a_version_is_rejected(client, make_venue):
+    venue_id = make_venue()
+    assert client.post('/venues/%d/edit' % venue_id, data=VENUE_FORM).status_code == 400
+
+
+@pytest.mark.parametrize('collection', ['venues', 'artists'])
+def test_edit_page_of_a_missing_row_is_404(client, collection):
+    assert client.get('/%s/999/edit' % collection).status_code == 404
+
+
+def test_archived_venue_cannot_be_edited(client, make_venue):
+    venue_id = make_venue()
+    client.post('/venues/archive', data={'ids': venue_id})
+    assert client.get('/venues/%d/edit' % venue_id).status_code == 404
+    assert client.post('/venues/%d/edit' % venue_id, data=dict(VENUE_FORM, version=2)).status_code == 404
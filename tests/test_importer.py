@@ -0,0 +1,73 @@
+import csv
+import json
+
+from models import db, TableVersion, mark_written
+
+VENUES_CSV = '''name,city,state,address,phone,image_link,facebook_link,website,genres
+Imported Hall,Austin,TX,2 Side St,123-456-7890,http://example.com/i.png,http://facebook.com/hall,http://hall.example.com,Jazz;Blues
+'''
+
+
+def import_file(app, tmp_path, kind, content, name='rows.csv'):
+    source = tmp_path / name
+    source.write_text(content)
+    return app.test_cli_runner().invoke(args=['import', kind, str(source)])
+
+
+def test_import_changes_the_list_etag(app, client, tmp_path, make_venue):
+    make_venue('Existing')
+    etag = client.get('/venues').headers['ETag']
+
+    result = import_file(app, tmp_path, 'venues', VENUES_CSV)
+    assert 'Imported 1 venues' in result.output
+
+    response = client.get('/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Imported Hall' in response.get_data()
+
+
+def test_mark_written_bumps_the_table_version(app):
+    # What copy_rows does after a COPY on the raw connection.
+    with app.app_context():
+        before = db.session.get(TableVersion, 'Venue').version
+        db.session.close()
+        mark_written(db.session, 'Venue')
+        db.session.commit()
+        assert db.session.get(TableVersion, 'Venue').version == before + 1
+
+
+def test_invalid_rows_go_to_the_rejects_file(app, client, tmp_path):
+    content = VENUES_CSV + (
+        ',Austin,TX,3 Side St,123-456-7890,http://example.com/i.png,http://facebook.com/x,http://x.example.com,Jazz\n'
+        'Bad State,Austin,ZZ,4 Side St,123-456-7890,http://example.com/i.png,http://facebook.com/y,'
+        'http://y.example.com,Jazz\n')
+    rejects = tmp_path / 'rejects.csv'
+    source = tmp_path / 'venues.csv'
+    source.write_text(content)
+    result = app.test_cli_runner().invoke(args=['import', 'venues', str(source), '--rejects', str(rejects)])
+
+    assert 'Imported 1 venues' in result.output
+    assert '2 rejected' in result.output
+    rows = list(csv.DictReader(rejects.open()))
+    assert [row['line'] for row in rows] == ['2', '3']
+    assert rows[0]['error'] == 'name: This field is required.'
+    assert rows[1]['error'].startswith('state: Not a valid choice')
+    assert rows[1]['genres'] == 'Jazz'
+    assert [item['name'] for item in client.get('/api/v1/venues').get_json()['data']] == ['Imported Hall']
+
+
+def test_show_rows_resolve_names_and_reject_unknown_ones(app, client, tmp_path, make_venue, make_artist):
+    make_venue('The Venue')
+    make_artist('The Artist')
+    rejects = tmp_path / 'rejects.ndjson'
+    source = tmp_path / 'shows.ndjson'
+    source.write_text(
+        '{"name": "Known", "venue_name": "The Venue", "artist_name": "The Artist", "start_time": "2031-05-01 20:00:00"}\n'
+        '{"name": "Unknown", "venue_name": "Nowhere", "artist_name": "The Artist", "start_time": "2031-05-01 20:00:00"}\n')
+    result = app.test_cli_runner().invoke(args=['import', 'shows', str(source), '--rejects', str(rejects)])
+
+    assert 'Imported 1 shows' in result.output
+    assert [json.loads(line)['error'] for line in rejects.read_text().splitlines()] == ['unknown or ambiguous venue']
+    venue = client.get('/api/v1/venues').get_json()['data'][0]
+    page = client.get('/venues/%d' % venue['id']).get_data(as_text=True)
+    assert '1 Upcoming' in page
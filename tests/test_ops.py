@@ -0,0 +1,21 @@
+import pytest
+
+from config import ProductionConfig
+
+ENDPOINTS = ['/cache/stats', '/pool/stats', '/logs/stats', '/metrics']
+
+
+@pytest.mark.parametrize('url', ENDPOINTS)
+def test_open_without_an_allowlist(client, url):
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', ENDPOINTS)
+def test_hidden_from_addresses_outside_the_allowlist(app, client, url):
+    app.config['OPS_ALLOWED_ADDRS'] = ['10.0.0.5']
+    assert client.get(url, environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 404
+    assert client.get(url, environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+
+
+def test_production_allows_loopback_only():
+    assert ProductionConfig.OPS_ALLOWED_ADDRS == ['127.0.0.1', '::1']
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Venue, Artist
+from queries import decode_cursor, encode_cursor, load_artist_index, load_artist_page, load_detail, load_show_page
+
+
+def walk_artists(session, per_page, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = load_artist_page(session, cursor=cursor, per_page=per_page, **kwargs)
+        pages.append([artist.name for artist in page.artists])
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('total, pages', [(4, 2), (5, 3), (0, 1)])
+def test_artist_pages_end_exactly_at_the_last_row(app, make_artist, total, pages):
+    for number in range(total):
+        make_artist('Artist %d' % number)
+    with app.app_context():
+        walked = walk_artists(db.session, per_page=2)
+    assert len(walked) == pages
+    assert sum(walked, []) == ['Artist %d' % number for number in range(total)]
+
+
+def test_artist_pages_keep_rows_that_share_a_name(app, make_artist):
+    # The id breaks ties, so no duplicate is skipped or repeated at a page edge.
+    for _ in range(3):
+        make_artist('Same')
+    make_artist('same')
+    with app.app_context():
+        walked = walk_artists(db.session, per_page=1)
+        ids = [row.id for row in load_artist_page(db.session, per_page=10).artists]
+    assert sum(walked, []) == ['Same', 'Same', 'Same', 'same']
+    assert ids == sorted(ids)
+
+
+def test_every_index_letter_reaches_its_artists(app, make_artist):
+    for name in ('alpha', 'Beta', 'bravo', 'Zed', '42nd Street'):
+        make_artist(name)
+    with app.app_context():
+        index = load_artist_index(db.session)
+        first = {letter: load_artist_page(db.session, start=start, per_page=1).artists[0].name
+                 for letter, (start, _) in index.items()}
+    assert {letter: count for letter, (_, count) in index.items()} == {'#': 1, 'A': 1, 'B': 2, 'Z': 1}
+    assert first == {'#': '42nd Street', 'A': 'alpha', 'B': 'Beta', 'Z': 'Zed'}
+
+
+def test_show_feed_pages_through_shows_at_the_same_time(app, make_venue, make_artist, make_show):
+    venue_id, artist_id = make_venue(), make_artist()
+    for number in range(5):
+        make_show(venue_id, artist_id, starts_in=timedelta(days=1 + number // 2), name='Show %d' % number)
+    with app.app_context():
+        seen, cursor = [], None
+        while True:
+            page = load_show_page(db.session, mode='upcoming', cursor=cursor, per_page=2)
+            seen += page.shows
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+    dates = [show['start_time'] for show in seen]
+    assert len(seen) == 5
+    assert dates == sorted(dates)
+
+
+def test_detail_caps_past_shows_and_continues_from_the_cursor(app, make_venue, make_artist, make_show):
+    venue_id, artist_id = make_venue(), make_artist()
+    for days in range(1, 6):
+        make_show(venue_id, artist_id, starts_in=-timedelta(days=days))
+    make_show(venue_id, artist_id, starts_in=timedelta(days=1))
+    with app.app_context():
+        first = load_detail(db.session, Venue, venue_id, past_limit=3)
+        rest = load_detail(db.session, Venue, venue_id, past_cursor=first['more_past_cursor'], past_limit=3)
+    assert len(first['upcoming_shows']) == 1
+    assert len(first['past_shows']) == 3
+    assert len(rest['past_shows']) == 2
+    assert rest['more_past_cursor'] is None
+    assert first['past_shows'][-1]['start_time'] > rest['past_shows'][0]['start_time']
+
+
+def test_missing_and_archived_entities_have_no_detail(app, client, make_artist):
+    artist_id = make_artist()
+    client.post('/artists/archive', data={'ids': artist_id})
+    with app.app_context():
+        assert load_detail(db.session, Artist, artist_id) is None
+        assert load_detail(db.session, Artist, 999) is None
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', encode_cursor('a', 1, 2)])
+def test_bad_cursors_decode_to_none(cursor):
+    assert decode_cursor(cursor, str, int) is None
+
+
+def test_cursor_round_trip():
+    when = datetime(2030, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor(when, 7), datetime.fromisoformat, int) == (when, 7)
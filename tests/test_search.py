@@ -0,0 +1,34 @@
+import views
+from models import db, Venue
+
+
+def search(app, term):
+    with app.app_context():
+        return [item['name'] for item in views.search_engine.search(db.session, Venue, term).data]
+
+
+def test_prefix_search_ranks_names_first(app, make_venue):
+    make_venue('Jazz Cellar', genres=('Rock n Roll',))
+    make_venue('Blue Room', genres=('Jazz',))
+    make_venue('Park Hall')
+    assert search(app, 'ja') == ['Jazz Cellar', 'Blue Room', 'Park Hall']
+    assert search(app, 'cel') == ['Jazz Cellar']
+    assert search(app, 'zzz') == []
+
+
+def test_index_picks_up_writes_it_was_not_told_about(app, make_venue):
+    make_venue('Old Hall')
+    assert search(app, 'hall') == ['Old Hall']
+    # Another worker, or `flask import`, writing directly to the table.
+    with app.app_context():
+        db.session.execute(db.update(Venue).values(name='New Hall', version=Venue.version + 1))
+        db.session.commit()
+    assert search(app, 'hall') == ['New Hall']
+
+
+def test_archived_venues_are_not_found(client, app, make_venue):
+    venue_id = make_venue('Closed Hall')
+    make_venue('Open Hall')
+    assert search(app, 'hall') == ['Closed Hall', 'Open Hall']
+    client.post('/venues/archive', data={'ids': venue_id})
+    assert search(app, 'hall') == ['Open Hall']
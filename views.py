@@ -0,0 +1,627 @@
+# ----------------------------------------------------------------------------#
+# Imports
+# ----------------------------------------------------------------------------#
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, jsonify, current_app, \
+    make_response, stream_template, Response
+from sqlalchemy.orm import selectinload
+import bulk
+import counters
+import edits
+from cache import Cache, venue_page_key, artist_page_key, artist_index_key
+from conditional import conditional
+from models import db, Venue, Artist, Show, genres_by_name
+from ops import operators_only
+from queries import counterpart_ids, detail_version, list_version, load_area_page, load_artist_index, \
+    load_artist_page, load_detail, load_show_page
+from ratelimit import RateLimiter
+from routing import read_only
+from search import SearchEngine, SEARCH_LIMIT
+
+from forms import *
+
+main = Blueprint('main', __name__)
+search_engine = SearchEngine()
+cache = Cache()
+limiter = RateLimiter()
+
+
+# ----------------------------------------------------------------------------#
+# Streaming
+# ----------------------------------------------------------------------------#
+
+def stream_page(template_name, **context):
+    """render_template for the long list pages: the response starts once the
+    first STREAM_CHUNK_SIZE characters are rendered, not the whole page."""
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+
+    def chunks(parts):
+        # Jinja yields many tiny strings; grouping them keeps the number of
+        # writes (and compression flushes) down.
+        buffer, size = [], 0
+        try:
+            for part in parts:
+                buffer.append(part)
+                size += len(part)
+                if size >= chunk_size:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield ''.join(buffer)
+        finally:
+            parts.close()
+
+    return Response(chunks(stream_template(template_name, **context)), mimetype='text/html')
+
+
+# ----------------------------------------------------------------------------#
+# Cache
+# ----------------------------------------------------------------------------#
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+    cache.delete(*[venue_page_key(venue_id) for venue_id in venue_ids],
+                 *[artist_page_key(artist_id) for artist_id in artist_ids])
+
+
+def invalidate_artist_index():
+    cache.delete(*[artist_index_key(genre) for genre in (None, *[name for name, _ in genres_choices])])
+
+
+def invalidate_edit(model, entity_id, changed):
+    """Drops only what an edit of ``changed`` fields can have made stale."""
+    counterparts = counterpart_ids(db.session, model, entity_id) if changed & edits.TILE_FIELDS else ()
+    if model is Venue:
+        invalidate_pages(venue_ids=[entity_id], artist_ids=counterparts)
+    else:
+        invalidate_pages(artist_ids=[entity_id], venue_ids=counterparts)
+        if changed & {'name', 'genres'}:
+            invalidate_artist_index()
+    if changed & edits.SEARCH_FIELDS:
+        search_engine.update(db.session.get(model, entity_id))
+
+
+@main.route('/cache/stats')
+@operators_only
+def cache_stats():
+    return jsonify(cache.stats())
+
+
+@main.route('/pool/stats')
+@operators_only
+def pool_stats():
+    return jsonify(current_app.extensions['pool_stats'].snapshot())
+
+
+@main.route('/logs/stats')
+@operators_only
+def log_stats():
+    # Empty in debug mode, where records go straight to stderr.
+    pipeline = current_app.extensions.get('logs')
+    return jsonify(pipeline.stats() if pipeline else {})
+
+
+# ----------------------------------------------------------------------------#
+# Controllers
+# ----------------------------------------------------------------------------#
+
+@main.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+# ----------------------------------------------------------------------------#
+# Venues
+# ----------------------------------------------------------------------------#
+@main.route('/venues')
+@read_only
+@conditional(lambda: list_version(db.session, Venue))
+def venues():
+    area_page = load_area_page(db.session,
+                               state=request.args.get('state') or None,
+                               genre=request.args.get('genre') or None,
+                               page=request.args.get('page', 1, type=int))
+    return stream_page('pages/venues.html', areas=area_page.areas, pagination=area_page,
+                       genres=[name for name, _ in genres_choices])
+
+
+@main.route('/venues/search', methods=['GET', 'POST'])
+@read_only
+@limiter.limit('search')
+def search_venues():
+    search_term = request.values.get('search_term', '')
+    page = max(request.values.get('page', 1, type=int), 1)
+    results = search_engine.search(db.session, Venue, search_term, offset=(page - 1) * SEARCH_LIMIT)
+    return render_template('pages/search_venues.html',
+                           results=results,
+                           search_term=search_term,
+                           page=page,
+                           has_next=page * SEARCH_LIMIT < results.count)
+
+
+@main.route('/venues/<int:venue_id>')
+@read_only
+@conditional(lambda venue_id: detail_version(db.session, Venue, venue_id))
+@cache.cached_page(venue_page_key)
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    detail = load_detail(db.session, Venue, venue_id, past_cursor=request.args.get('past'))
+    if detail is None:
+        abort(404)
+    venue = detail["entity"]
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": [genre.name for genre in venue.genres],
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "image_link": venue.image_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "past_shows": detail["past_shows"],
+        "upcoming_shows": detail["upcoming_shows"],
+        "past_shows_count": detail["past_shows_count"],
+        "upcoming_shows_count": detail["upcoming_shows_count"],
+        "more_past_cursor": detail["more_past_cursor"],
+    }
+    return render_template('pages/show_venue.html', venue=data)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # called upon submitting the new artist listing form
+    form = VenueForm(request.form)
+    if not form.validate():
+        current_app.logger.info('Rejected form: %s', form.errors)
+        abort(400)
+    else:
+        error = False
+        try:
+            venue = Venue(
+                name=form.name.data,
+                address=form.address.data,
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                genres=genres_by_name(db.session, form.genres.data),
+                facebook_link=form.facebook_link.data,
+                image_link=form.image_link.data,
+                website=form.website.data,
+                seeking_talent=form.seeking_talent.data,
+                seeking_description=form.seeking_description.data,
+            )
+            db.session.add(venue)
+            db.session.commit()
+            search_engine.update(venue)
+            invalidate_pages(venue_ids=[venue.id])
+        except Exception:
+            error = True
+            db.session.rollback()
+            current_app.logger.exception('Could not create venue %s', form.name.data)
+        finally:
+            db.session.close()
+        if error:
+            flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
+            abort(400)
+        else:
+            flash('Venue ' + form.name.data + ' was successfully edited!')
+    return render_template('pages/home.html')
+
+
+#  Delete Venue
+#  ----------------------------------------------------------------
+
+@main.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    error = False
+    try:
+        delete_entities(Venue, [venue_id])
+    except Exception:
+        error = True
+        db.session.rollback()
+        current_app.logger.exception('Could not delete venue %s', venue_id)
+    finally:
+        db.session.close()
+    if error:
+        flash('An error occurred. Venue with id %s could not be deleted.' % venue_id)
+        abort(400)
+    else:
+        flash('Venue with id %s was successfully deleted!' % venue_id)
+    return render_template('pages/home.html')
+
+
+#  Edit Venue
+#  ----------------------------------------------------------------
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.filter_by(id=venue_id, archived_at=None).first_or_404()
+    # Not bound to request.form: edit conflicts re-render the stored values.
+    form = EditVenueForm(formdata=None)
+    form.name.default = venue.name
+    form.genres.default = [genre.name for genre in venue.genres]
+    form.city.default = venue.city
+    form.address.default = venue.address
+    form.state.default = venue.state
+    form.phone.default = venue.phone
+    form.seeking_talent.default = venue.seeking_talent
+    form.seeking_description.default = venue.seeking_description
+    form.website.default = venue.website
+    form.image_link.default = venue.image_link
+    form.facebook_link.default = venue.facebook_link
+    form.version.default = venue.version
+    form.process()
+    venue = {"id": venue_id, "name": venue.name}
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    form = EditVenueForm(request.form)
+    if not form.validate():
+        current_app.logger.info('Rejected form: %s', form.errors)
+        abort(400)
+    error = conflict = False
+    changed = None
+    try:
+        values = {column: getattr(form, column).data for column in edits.EDITABLE[Venue]}
+        changed = edits.apply_edit(db.session, Venue, venue_id, form.version.data, values, form.genres.data)
+        db.session.commit()
+        if changed:
+            invalidate_edit(Venue, venue_id, changed)
+    except edits.EditConflict:
+        conflict = True
+        db.session.rollback()
+    except Exception:
+        error = True
+        db.session.rollback()
+        current_app.logger.exception('Could not edit venue %s', venue_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(400)
+    if conflict:
+        flash('Venue ' + form.name.data + ' was changed by someone else while you were editing it. '
+              'Review the current details and apply your changes again.')
+        return edit_venue(venue_id), 409
+    if changed is None:
+        abort(404)
+    flash('Venue ' + form.name.data + (' was successfully edited!' if changed else ' had no changes to save.'))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
+
+
+# ----------------------------------------------------------------------------#
+# Artists
+# ----------------------------------------------------------------------------#
+@main.route('/artists')
+@read_only
+@conditional(lambda: list_version(db.session, Artist))
+def artists():
+    genre = request.args.get('genre') or None
+    artist_page = load_artist_page(db.session, genre=genre,
+                                   cursor=request.args.get('cursor'),
+                                   start=request.args.get('start') or None)
+    index = cache.get_or_set(artist_index_key(genre), lambda: load_artist_index(db.session, genre))
+    return stream_page('pages/artists.html', artists=artist_page.artists, pagination=artist_page, index=index,
+                       genre=genre, genres=[name for name, _ in genres_choices])
+
+
+@main.route('/artists/search', methods=['GET', 'POST'])
+@read_only
+@limiter.limit('search')
+def search_artists():
+    search_term = request.values.get('search_term', '')
+    page = max(request.values.get('page', 1, type=int), 1)
+    results = search_engine.search(db.session, Artist, search_term, offset=(page - 1) * SEARCH_LIMIT)
+    return render_template('pages/search_artists.html',
+                           results=results,
+                           search_term=search_term,
+                           page=page,
+                           has_next=page * SEARCH_LIMIT < results.count)
+
+
+@main.route('/artists/<int:artist_id>')
+@read_only
+@conditional(lambda artist_id: detail_version(db.session, Artist, artist_id))
+@cache.cached_page(artist_page_key)
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    detail = load_detail(db.session, Artist, artist_id, past_cursor=request.args.get('past'))
+    if detail is None:
+        abort(404)
+    artist = detail["entity"]
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": [genre.name for genre in artist.genres],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "image_link": artist.image_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "past_shows": detail["past_shows"],
+        "upcoming_shows": detail["upcoming_shows"],
+        "past_shows_count": detail["past_shows_count"],
+        "upcoming_shows_count": detail["upcoming_shows_count"],
+        "more_past_cursor": detail["more_past_cursor"],
+    }
+    return render_template('pages/show_artist.html', artist=data)
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    form = ArtistForm(request.form)
+    if not form.validate():
+        current_app.logger.info('Rejected form: %s', form.errors)
+        abort(400)
+    else:
+        error = False
+        try:
+            artist = Artist(
+                name=form.name.data,
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                genres=genres_by_name(db.session, form.genres.data),
+                facebook_link=form.facebook_link.data,
+                image_link=form.image_link.data,
+                website=form.website.data,
+                seeking_venue=form.seeking_venue.data,
+                seeking_description=form.seeking_description.data,
+            )
+            db.session.add(artist)
+            db.session.commit()
+            search_engine.update(artist)
+            invalidate_pages(artist_ids=[artist.id])
+            invalidate_artist_index()
+        except Exception:
+            error = True
+            db.session.rollback()
+            current_app.logger.exception('Could not create artist %s', form.name.data)
+        finally:
+            db.session.close()
+        if error:
+            flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
+            abort(400)
+        else:
+            flash('Artist ' + form.name.data + ' was successfully listed!')
+        return render_template('pages/home.html')
+
+
+#  Delete Artist
+#  ----------------------------------------------------------------
+@main.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    error = False
+    try:
+        delete_entities(Artist, [artist_id])
+    except Exception:
+        error = True
+        db.session.rollback()
+        current_app.logger.exception('Could not delete artist %s', artist_id)
+    finally:
+        db.session.close()
+    if error:
+        flash('An error occurred. Artist with id %s could not be deleted.' % artist_id)
+        abort(400)
+    else:
+        flash('Artist with id %s was successfully deleted!' % artist_id)
+    return render_template('pages/home.html')
+
+
+#  Edit Artist
+#  ----------------------------------------------------------------
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.filter_by(id=artist_id, archived_at=None).first_or_404()
+    # Not bound to request.form: edit conflicts re-render the stored values.
+    form = EditArtistForm(formdata=None)
+    form.name.default = artist.name
+    form.genres.default = [genre.name for genre in artist.genres]
+    form.city.default = artist.city
+    form.state.default = artist.state
+    form.phone.default = artist.phone
+    form.seeking_venue.default = artist.seeking_venue
+    form.seeking_description.default = artist.seeking_description
+    form.website.default = artist.website
+    form.image_link.default = artist.image_link
+    form.facebook_link.default = artist.facebook_link
+    form.version.default = artist.version
+    form.process()
+    artist = {"id": artist_id, "name": artist.name}
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    form = EditArtistForm(request.form)
+    if not form.validate():
+        current_app.logger.info('Rejected form: %s', form.errors)
+        abort(400)
+    error = conflict = False
+    changed = None
+    try:
+        values = {column: getattr(form, column).data for column in edits.EDITABLE[Artist]}
+        changed = edits.apply_edit(db.session, Artist, artist_id, form.version.data, values, form.genres.data)
+        db.session.commit()
+        if changed:
+            invalidate_edit(Artist, artist_id, changed)
+    except edits.EditConflict:
+        conflict = True
+        db.session.rollback()
+    except Exception:
+        error = True
+        db.session.rollback()
+        current_app.logger.exception('Could not edit artist %s', artist_id)
+    finally:
+        db.session.close()
+    if error:
+        abort(400)
+    if conflict:
+        flash('Artist ' + form.name.data + ' was changed by someone else while you were editing it. '
+              'Review the current details and apply your changes again.')
+        return edit_artist(artist_id), 409
+    if changed is None:
+        abort(404)
+    flash('Artist ' + form.name.data + (' was successfully edited!' if changed else ' had no changes to save.'))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
+
+
+# ----------------------------------------------------------------------------#
+# Bulk delete and archive
+# ----------------------------------------------------------------------------#
+
+BULK_MODELS = {'venues': Venue, 'artists': Artist}
+
+
+def delete_entities(model, ids):
+    """Deletes venues or artists set-based, keeping pages and search in sync."""
+    deleted, counterparts = bulk.delete_owners(db.session, model, ids)
+    db.session.commit()
+    for entity_id in ids:
+        search_engine.remove(model, entity_id)
+    if model is Venue:
+        invalidate_pages(venue_ids=ids, artist_ids=counterparts)
+    else:
+        invalidate_pages(artist_ids=ids, venue_ids=counterparts)
+        invalidate_artist_index()
+    return deleted
+
+
+def bulk_ids():
+    # Either {"ids": [...]} as JSON or repeated ids form fields.
+    body = request.get_json(silent=True)
+    values = body.get('ids') if isinstance(body, dict) else request.form.getlist('ids')
+    try:
+        ids = sorted({int(value) for value in values or ()})
+    except (TypeError, ValueError):
+        abort(400)
+    if not ids or len(ids) > bulk.MAX_BULK_IDS:
+        abort(400)
+    return ids
+
+
+@main.route('/<any(venues, artists):collection>/delete', methods=['POST'])
+def bulk_delete(collection):
+    deleted = delete_entities(BULK_MODELS[collection], bulk_ids())
+    return jsonify({"deleted": deleted})
+
+
+@main.route('/<any(venues, artists):collection>/<any(archive, restore):action>', methods=['POST'])
+def bulk_archive(collection, action):
+    model = BULK_MODELS[collection]
+    ids = bulk_ids()
+    changed = bulk.archive_owners(db.session, model, ids, archived=action == 'archive')
+    db.session.commit()
+    if action == 'archive':
+        for entity_id in ids:
+            search_engine.remove(model, entity_id)
+    else:
+        for entity in model.query.options(selectinload(model.genres)).filter(model.id.in_(ids)):
+            search_engine.update(entity)
+    if model is Venue:
+        invalidate_pages(venue_ids=ids)
+    else:
+        invalidate_pages(artist_ids=ids)
+        invalidate_artist_index()
+    return jsonify({"archived" if action == 'archive' else "restored": changed})
+
+
+# ----------------------------------------------------------------------------#
+# Shows
+# ----------------------------------------------------------------------------#
+@main.route('/shows')
+@read_only
+@conditional(lambda: list_version(db.session, Show, Venue, Artist))
+def shows():
+    show_page = load_show_page(db.session,
+                               mode=request.args.get('mode', 'all'),
+                               cursor=request.args.get('cursor'))
+    return stream_page('pages/shows.html', shows=show_page.shows, pagination=show_page)
+
+
+@main.route('/shows/create', methods=['GET'])
+def create_shows_form():
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    form = ShowForm(request.form)
+    if not form.validate():
+        current_app.logger.info('Rejected form: %s', form.errors)
+        abort(400)
+    else:
+        error = False
+        try:
+            show = Show(
+                name=form.name.data,
+                artist_id=form.artist_id.data,
+                venue_id=form.venue_id.data,
+                date=form.start_time.data,
+            )
+            db.session.add(show)
+            db.session.flush()
+            counters.count_shows(db.session, [(show.venue_id, show.artist_id, show.is_past)])
+            db.session.commit()
+            invalidate_pages(venue_ids=[form.venue_id.data], artist_ids=[form.artist_id.data])
+        except Exception:
+            error = True
+            db.session.rollback()
+            current_app.logger.exception('Could not create show %s', form.name.data)
+        finally:
+            db.session.close()
+        if error:
+            flash('An error occurred. Show ' + form.name.data + ' could not be listed.')
+            abort(400)
+        else:
+            flash('Show ' + form.name.data + ' was successfully listed!')
+        return render_template('pages/home.html')
+
+
+# ----------------------------------------------------------------------------#
+# Errors
+# ----------------------------------------------------------------------------#
+@main.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@main.app_errorhandler(429)
+@main.app_errorhandler(503)
+def overloaded_error(error):
+    response = make_response(render_template('errors/%d.html' % error.code), error.code)
+    if error.retry_after is not None:
+        response.retry_after = error.retry_after
+    return response
+
+
+@main.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500